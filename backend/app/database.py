@@ -13,7 +13,26 @@ if DATABASE_URL.startswith("postgres://"):
 elif DATABASE_URL.startswith("postgresql://") and "+asyncpg" not in DATABASE_URL:
     DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
 
-engine = create_async_engine(DATABASE_URL, echo=False)
+engine = create_async_engine(
+    DATABASE_URL,
+    echo=False,
+    # Pool pro souběžné requesty; pre_ping + recycle proti mrtvým spojením na Railway
+    pool_size=20,
+    max_overflow=10,
+    pool_timeout=30,
+    pool_recycle=1800,
+    pool_pre_ping=True,
+    # Hromadné inserty (executemany) posílej po větších dávkách multi-row VALUES
+    insertmanyvalues_page_size=10000,
+    connect_args={
+        # Cache připravených statementů (SQLAlchemy adapter + asyncpg) - opakované
+        # dotazy se stejným SQL se na serveru neparsují znovu
+        "prepared_statement_cache_size": 256,
+        "statement_cache_size": 1024,
+        # Krátké OLTP dotazy - JIT kompilace plánu jen přidává latenci
+        "server_settings": {"jit": "off"},
+    },
+)
 async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 
@@ -12,14 +12,96 @@ Použití v route_plans.py:
         db=db
     )
 """
+import re
 from datetime import datetime
-from typing import Optional, Tuple
-from sqlalchemy import select
+from functools import lru_cache
+from typing import NamedTuple, Optional
+from sqlalchemy import bindparam, insert, literal, or_, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models import Depot, DepotNameMapping
 
 
+class DepotInfo(NamedTuple):
+    """Informace o depu odvozené z názvu startovního místa."""
+    name: str
+    code: str
+    depot_type: str
+    operator_type: str
+    location_code: Optional[str]
+
+
+# Známá depa - (klíčová slova, info). Pořadí určuje prioritu detekce.
+_KNOWN_DEPOTS = (
+    # Expediční sklady Alzy
+    (('CHRÁŠŤAN', 'CHRASTANY', 'CZLC4'), DepotInfo(
+        name='Expedice Chrášťany',
+        code='CZLC4',
+        depot_type='WAREHOUSE',
+        operator_type='ALZA',
+        location_code='CZLC4'
+    )),
+    (('CZTC1', 'ÚŽICE', 'UZICE', 'TŘÍDÍRNA'), DepotInfo(
+        name='Třídírna Úžice',
+        code='CZTC1',
+        depot_type='WAREHOUSE',
+        operator_type='ALZA',
+        location_code='CZTC1'
+    )),
+    # Rozvozová depa dopravců - Drivecool má depo ve Vratimově
+    (('DRIVECOOL',), DepotInfo(
+        name='Depo Vratimov',
+        code='VRATIMOV',
+        depot_type='DISTRIBUTION',
+        operator_type='CARRIER',
+        location_code=None
+    )),
+    (('GEM',), DepotInfo(
+        name='Depo GEM',
+        code='GEM',
+        depot_type='DISTRIBUTION',
+        operator_type='CARRIER',
+        location_code=None
+    )),
+    (('NOVÝ BYDŽOV', 'BYDZOV', 'BYDŽOV'), DepotInfo(
+        name='Depo Nový Bydžov',
+        code='BYDZOV',
+        depot_type='DISTRIBUTION',
+        operator_type='CARRIER',
+        location_code=None
+    )),
+    (('HOSÍN', 'HOSIN'), DepotInfo(
+        name='Depo Hosín',
+        code='HOSIN',
+        depot_type='DISTRIBUTION',
+        operator_type='CARRIER',
+        location_code=None
+    )),
+)
+
+# Klíčové slovo -> (priorita, info)
+_TOKEN_TO_INFO = {
+    token: (priority, info)
+    for priority, (tokens, info) in enumerate(_KNOWN_DEPOTS)
+    for token in tokens
+}
+
+# Všechna klíčová slova v jedné alternaci - hledání běží v C v jednom průchodu
+_DEPOT_PATTERN = re.compile('|'.join(re.escape(token) for token in _TOKEN_TO_INFO))
+
+
+# Náhrada diakritiky v generovaném kódu depa - jeden průchod místo řetězu replace()
+_DIACRITIC_TABLE = str.maketrans({
+    'Á': 'A', 'É': 'E', 'Í': 'I', 'Ó': 'O', 'Ú': 'U',
+    'Ý': 'Y', 'Č': 'C', 'Ř': 'R', 'Š': 'S', 'Ž': 'Z',
+    'Ď': 'D', 'Ť': 'T', 'Ň': 'N', 'Ě': 'E', 'Ů': 'U',
+})
+
+# Lookup mapování podle názvu z plánu - sestaveno jednou, stejné SQL pro všechna volání
+_MAPPING_LOOKUP_STMT = select(DepotNameMapping.depot_id).where(
+    DepotNameMapping.plan_name == bindparam("plan_name")
+)
+
 async def resolve_depot_for_route(
     start_location: Optional[str],
     route_name: str,
@@ -37,7 +119,7 @@ async def resolve_depot_for_route(
     
     Args:
         start_location: Hodnota ze sloupce "Startovní místo" (např. "Depo Drivecool")
-        route_name: Název trasy (např. "Moravskoslezsko A") - pro fallback detekci
+        route_name: Název trasy (např. "Moravskoslezsko A") - depo se určuje jen ze start_location
         carrier_id: ID dopravce
         valid_from: Datum platnosti plánu
         db: Database session
@@ -51,44 +133,76 @@ async def resolve_depot_for_route(
     start_location = start_location.strip()
     
     # 1. Zkus najít v DepotNameMapping
-    result = await db.execute(
-        select(DepotNameMapping).where(DepotNameMapping.plan_name == start_location)
+    result = await db.execute(_MAPPING_LOOKUP_STMT, {"plan_name": start_location})
+    depot_id = result.scalar_one_or_none()
+    
+    if depot_id is not None:
+        # Aktualizuj valid_from depa pokud je starší - podmínka přímo v UPDATE
+        if valid_from is not None:
+            await db.execute(
+                update(Depot)
+                .where(
+                    Depot.id == depot_id,
+                    or_(Depot.valid_from.is_(None), Depot.valid_from > valid_from)
+                )
+                .values(valid_from=valid_from)
+            )
+        return depot_id
+    
+    # 2. Neexistuje - vytvoř Depot i mapping jedním příkazem
+    #    (WITH new_depot AS (INSERT ... RETURNING id) INSERT INTO mapping SELECT ...)
+    new_depot = (
+        insert(Depot)
+        .values(**depot_values(start_location, carrier_id, valid_from))
+        .returning(Depot.id)
+        .cte("new_depot")
     )
-    mapping = result.scalar_one_or_none()
-    
-    if mapping:
-        # Aktualizuj valid_from depa pokud je starší
-        depot = await db.get(Depot, mapping.depot_id)
-        if depot and (depot.valid_from is None or valid_from < depot.valid_from):
-            depot.valid_from = valid_from
-        return mapping.depot_id
-    
-    # 2. Neexistuje - vytvoř nové Depot a mapping
-    depot_info = detect_depot_info(start_location, route_name)
-    
-    new_depot = Depot(
-        name=depot_info['name'],
-        code=depot_info['code'],
-        depot_type=depot_info['depot_type'],
-        operator_type=depot_info['operator_type'],
-        operator_carrier_id=carrier_id if depot_info['operator_type'] == 'CARRIER' else None,
-        valid_from=valid_from,
-        location_code=depot_info.get('location_code'),
+    result = await db.execute(
+        insert(DepotNameMapping)
+        .from_select(
+            [DepotNameMapping.plan_name, DepotNameMapping.depot_id],
+            select(literal(start_location), new_depot.c.id)
+        )
+        .returning(DepotNameMapping.depot_id)
     )
-    db.add(new_depot)
-    await db.flush()  # Získej ID
     
-    # Vytvoř mapping
-    new_mapping = DepotNameMapping(
-        plan_name=start_location,
-        depot_id=new_depot.id
-    )
-    db.add(new_mapping)
+    return result.scalar_one()
+
+
+def depot_values(
+    start_location: str,
+    carrier_id: int,
+    valid_from: datetime
+) -> dict:
+    """
+    Hodnoty sloupců nového Depot pro start_location podle detect_depot_info.
+    """
+    info = detect_depot_info(start_location)
     
-    return new_depot.id
+    return {
+        'name': info.name,
+        'code': info.code,
+        'depot_type': info.depot_type,
+        'operator_type': info.operator_type,
+        'operator_carrier_id': carrier_id if info.operator_type == 'CARRIER' else None,
+        'valid_from': valid_from,
+        'location_code': info.location_code,
+    }
+
+
+def build_depot(
+    start_location: str,
+    carrier_id: int,
+    valid_from: datetime
+) -> Depot:
+    """
+    Sestaví (neuložený) Depot pro start_location podle detect_depot_info.
+    """
+    return Depot(**depot_values(start_location, carrier_id, valid_from))
 
 
-def detect_depot_info(start_location: str, route_name: str) -> dict:
+@lru_cache(maxsize=512)
+def detect_depot_info(start_location: str) -> DepotInfo:
     """
     Detekuje informace o depu z názvu startovního místa.
     
@@ -98,67 +212,18 @@ def detect_depot_info(start_location: str, route_name: str) -> dict:
     - "Depo GEM" → rozvozové depo dopravce
     - "CZTC1" → třídírna Alzy (Úžice)
     
+    Výsledek je cachovaný - v plánu se stejné startovní místo opakuje
+    u mnoha tras.
+    
     Returns:
-        dict s klíči: name, code, depot_type, operator_type, location_code
+        DepotInfo (name, code, depot_type, operator_type, location_code)
     """
     loc_upper = start_location.upper()
     
-    # Expediční sklady Alzy
-    if 'CHRÁŠŤAN' in loc_upper or 'CHRASTANY' in loc_upper or 'CZLC4' in loc_upper:
-        return {
-            'name': 'Expedice Chrášťany',
-            'code': 'CZLC4',
-            'depot_type': 'WAREHOUSE',
-            'operator_type': 'ALZA',
-            'location_code': 'CZLC4'
-        }
-    
-    if 'CZTC1' in loc_upper or 'ÚŽICE' in loc_upper or 'UZICE' in loc_upper or 'TŘÍDÍRNA' in loc_upper:
-        return {
-            'name': 'Třídírna Úžice',
-            'code': 'CZTC1',
-            'depot_type': 'WAREHOUSE',
-            'operator_type': 'ALZA',
-            'location_code': 'CZTC1'
-        }
-    
-    # Rozvozová depa dopravců - detekce podle názvu
-    if 'DRIVECOOL' in loc_upper:
-        # Drivecool má depo ve Vratimově
-        return {
-            'name': 'Depo Vratimov',
-            'code': 'VRATIMOV',
-            'depot_type': 'DISTRIBUTION',
-            'operator_type': 'CARRIER',
-            'location_code': None
-        }
-    
-    if 'GEM' in loc_upper:
-        return {
-            'name': 'Depo GEM',
-            'code': 'GEM',
-            'depot_type': 'DISTRIBUTION',
-            'operator_type': 'CARRIER',
-            'location_code': None
-        }
-    
-    if 'NOVÝ BYDŽOV' in loc_upper or 'BYDZOV' in loc_upper or 'BYDŽOV' in loc_upper:
-        return {
-            'name': 'Depo Nový Bydžov',
-            'code': 'BYDZOV',
-            'depot_type': 'DISTRIBUTION',
-            'operator_type': 'CARRIER',
-            'location_code': None
-        }
-    
-    if 'HOSÍN' in loc_upper or 'HOSIN' in loc_upper:
-        return {
-            'name': 'Depo Hosín',
-            'code': 'HOSIN',
-            'depot_type': 'DISTRIBUTION',
-            'operator_type': 'CARRIER',
-            'location_code': None
-        }
+    # Jeden průchod řetězcem; při více shodách vyhraje pravidlo s nejvyšší prioritou
+    matches = _DEPOT_PATTERN.findall(loc_upper)
+    if matches:
+        return min((_TOKEN_TO_INFO[token] for token in matches), key=lambda item: item[0])[1]
     
     # Fallback - použij název přímo
     # Odstraň "Depo " prefix pokud existuje
@@ -169,27 +234,25 @@ def detect_depot_info(start_location: str, route_name: str) -> dict:
     # Generuj kód z názvu (první slovo, uppercase, bez diakritiky)
     code = name.split()[0].upper() if name else 'UNKNOWN'
     # Jednoduchá náhrada diakritiky
-    code = code.replace('Á', 'A').replace('É', 'E').replace('Í', 'I').replace('Ó', 'O').replace('Ú', 'U')
-    code = code.replace('Ý', 'Y').replace('Č', 'C').replace('Ř', 'R').replace('Š', 'S').replace('Ž', 'Z')
-    code = code.replace('Ď', 'D').replace('Ť', 'T').replace('Ň', 'N').replace('Ě', 'E').replace('Ů', 'U')
+    code = code.translate(_DIACRITIC_TABLE)
     
-    return {
-        'name': f'Depo {name}',
-        'code': code[:20],  # Max 20 znaků
-        'depot_type': 'DISTRIBUTION',
-        'operator_type': 'CARRIER',
-        'location_code': None
-    }
+    return DepotInfo(
+        name=f'Depo {name}',
+        code=code[:20],  # Max 20 znaků
+        depot_type='DISTRIBUTION',
+        operator_type='CARRIER',
+        location_code=None
+    )
 
 
-async def get_unique_start_locations(routes_data: list) -> set:
+def get_unique_start_locations(routes_data: list) -> set:
     """
-    Vrátí množinu unikátních start_location hodnot z parsovaných dat tras.
+    Vrátí množinu unikátních neprázdných start_location hodnot z parsovaných dat tras.
     """
     return {
-        route.get('start_location', '').strip()
-        for route in routes_data
-        if route.get('start_location')
+        start_loc
+        for start_loc in ((route.get('start_location') or '').strip() for route in routes_data)
+        if start_loc
     }
 
 
@@ -202,21 +265,47 @@ async def resolve_all_depots_for_plan(
     """
     Vyřeší depot_id pro všechny unikátní start_location v plánu.
     
+    Mapování i depa se načítají hromadně (IN dotazy), takže počet
+    round-tripů nezávisí na počtu startovních míst.
+    
     Returns:
         dict: {start_location: depot_id}
     """
-    start_locations = await get_unique_start_locations(routes_data)
-    
-    result = {}
-    for start_loc in start_locations:
-        if start_loc:
-            depot_id = await resolve_depot_for_route(
-                start_location=start_loc,
-                route_name='',  # Není potřeba pro lookup
-                carrier_id=carrier_id,
-                valid_from=valid_from,
-                db=db
-            )
-            result[start_loc] = depot_id
+    start_locations = get_unique_start_locations(routes_data)
+    
+    if not start_locations:
+        return {}
+    
+    # 1. Všechna existující mapování jedním dotazem
+    mappings = await db.execute(
+        select(DepotNameMapping).where(DepotNameMapping.plan_name.in_(start_locations))
+    )
+    result = {m.plan_name: m.depot_id for m in mappings.scalars()}
+    
+    # 2. Aktualizuj valid_from existujících dep, pokud je plán starší
+    if result:
+        depots = await db.execute(
+            select(Depot).where(Depot.id.in_(set(result.values())))
+        )
+        for depot in depots.scalars():
+            if depot.valid_from is None or valid_from < depot.valid_from:
+                depot.valid_from = valid_from
+    
+    # 3. Chybějící depa vytvoř najednou - jeden flush pro získání ID
+    new_depots = {
+        start_loc: build_depot(start_loc, carrier_id, valid_from)
+        for start_loc in start_locations
+        if start_loc not in result
+    }
+    
+    if new_depots:
+        db.add_all(new_depots.values())
+        await db.flush()
+        
+        db.add_all([
+            DepotNameMapping(plan_name=start_loc, depot_id=depot.id)
+            for start_loc, depot in new_depots.items()
+        ])
+        result.update({start_loc: depot.id for start_loc, depot in new_depots.items()})
     
     return result
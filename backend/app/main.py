@@ -8,7 +8,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy import text
 
 from app.database import engine, Base
-from app.middleware import APIKeyMiddleware
+from app.middleware import APIKeyASGIMiddleware, QueryBudgetASGIMiddleware
 from app.routers import carriers, depots, contracts, prices, proofs, invoices, analysis
 from app.routers import route_plans
 from app.routers import alzabox
@@ -17,18 +17,46 @@ from app.routers import routes
 from app.routers import expected_billing
 
 
+# Zvyš při každé změně v run_migrations nebo v modelech
+CURRENT_SCHEMA_VERSION = 14
+
+# Produkce = nastavený API_KEY (skryté docs, přeskočení create_all při aktuálním schématu)
+IS_PRODUCTION = bool(os.getenv("API_KEY"))
+
+
+async def get_schema_version(conn):
+    """Vrátí uloženou verzi schématu nebo None (tabulka ještě neexistuje)."""
+    result = await conn.execute(text("""SELECT to_regclass('"SchemaVersion"') IS NOT NULL"""))
+    if not result.scalar():
+        return None
+    
+    result = await conn.execute(text('SELECT version FROM "SchemaVersion" LIMIT 1'))
+    return result.scalar()
+
+
 async def run_migrations():
     """Run database migrations on startup"""
     async with engine.begin() as conn:
-        # Check if planType column exists
+        # Pokud už DB má aktuální verzi schématu, není co migrovat
+        result = await conn.execute(text('SELECT version FROM "SchemaVersion" LIMIT 1'))
+        schema_version = result.scalar()
+        
+        if schema_version is not None and schema_version >= CURRENT_SCHEMA_VERSION:
+            return
+        
+        # Sloupce i constrainty RoutePlan načteme jedním dotazem
         result = await conn.execute(text("""
-            SELECT column_name 
+            SELECT 'column', column_name 
             FROM information_schema.columns 
-            WHERE table_name = 'RoutePlan' AND column_name = 'planType'
+            WHERE table_name = 'RoutePlan'
+            UNION ALL
+            SELECT 'constraint', constraint_name 
+            FROM information_schema.table_constraints 
+            WHERE table_name = 'RoutePlan'
         """))
-        column_exists = result.fetchone() is not None
+        existing = {tuple(row) for row in result}
         
-        if not column_exists:
+        if ('column', 'planType') not in existing:
             print("Migration: Adding planType column to RoutePlan...")
             
             # Add column
@@ -46,15 +74,7 @@ async def run_migrations():
             
             print("Migration: planType column added successfully")
         
-        # Check if depot column exists
-        result = await conn.execute(text("""
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name = 'RoutePlan' AND column_name = 'depot'
-        """))
-        depot_column_exists = result.fetchone() is not None
-        
-        if not depot_column_exists:
+        if ('column', 'depot') not in existing:
             print("Migration: Adding depot column to RoutePlan...")
             
             await conn.execute(text("""
@@ -64,15 +84,7 @@ async def run_migrations():
             
             print("Migration: depot column added successfully")
         
-        # Check if vratimovStops column exists
-        result = await conn.execute(text("""
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name = 'RoutePlan' AND column_name = 'vratimovStops'
-        """))
-        stops_column_exists = result.fetchone() is not None
-        
-        if not stops_column_exists:
+        if ('column', 'vratimovStops') not in existing:
             print("Migration: Adding stops per depot columns to RoutePlan...")
             
             await conn.execute(text("""
@@ -86,15 +98,7 @@ async def run_migrations():
             
             print("Migration: stops columns added successfully")
         
-        # Check if vratimovKm column exists
-        result = await conn.execute(text("""
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name = 'RoutePlan' AND column_name = 'vratimovKm'
-        """))
-        km_column_exists = result.fetchone() is not None
-        
-        if not km_column_exists:
+        if ('column', 'vratimovKm') not in existing:
             print("Migration: Adding km per depot columns to RoutePlan...")
             
             await conn.execute(text("""
@@ -108,15 +112,7 @@ async def run_migrations():
             
             print("Migration: km columns added successfully")
         
-        # Check if vratimovDurationMin column exists
-        result = await conn.execute(text("""
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name = 'RoutePlan' AND column_name = 'vratimovDurationMin'
-        """))
-        duration_column_exists = result.fetchone() is not None
-        
-        if not duration_column_exists:
+        if ('column', 'vratimovDurationMin') not in existing:
             print("Migration: Adding duration per depot columns to RoutePlan...")
             
             await conn.execute(text("""
@@ -131,15 +127,7 @@ async def run_migrations():
             print("Migration: duration columns added successfully")
         
         # Check if NEW unique constraint exists (with depot)
-        result = await conn.execute(text("""
-            SELECT constraint_name 
-            FROM information_schema.table_constraints 
-            WHERE table_name = 'RoutePlan' 
-            AND constraint_name = 'uq_carrier_date_plantype_depot'
-        """))
-        new_constraint_exists = result.fetchone() is not None
-        
-        if not new_constraint_exists:
+        if ('constraint', 'uq_carrier_date_plantype_depot') not in existing:
             print("Migration: Updating unique constraint to include depot...")
             
             # Drop old constraints if they exist
@@ -160,25 +148,258 @@ async def run_migrations():
             """))
             
             print("Migration: Unique constraint updated successfully")
+        
+        # v2: složené indexy pro filtr carrier + period
+        await conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS ix_proof_carrier_period 
+            ON "Proof" ("carrierId", "period", "periodDate")
+        """))
+        await conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS ix_invoice_carrier_period 
+            ON "Invoice" ("carrierId", "period", "issueDate")
+        """))
+        
+        # v3: JSON sloupce ProofAnalysis z TEXT na JSONB
+        result = await conn.execute(text("""
+            SELECT column_name 
+            FROM information_schema.columns 
+            WHERE table_name = 'ProofAnalysis' AND data_type = 'text'
+        """))
+        text_columns = set(result.scalars())
+        
+        for column in ("errorsJson", "warningsJson", "okJson", "missingRatesJson"):
+            if column in text_columns:
+                print(f"Migration: Converting ProofAnalysis.{column} to JSONB...")
+                await conn.execute(text(f"""
+                    ALTER TABLE "ProofAnalysis" 
+                    ALTER COLUMN "{column}" TYPE JSONB 
+                    USING NULLIF("{column}", '')::jsonb
+                """))
+        
+        await conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS ix_proof_analysis_errors_gin 
+            ON "ProofAnalysis" USING gin ("errorsJson")
+        """))
+        
+        # v4: createdAt/updatedAt plní DB (server default místo Python callable)
+        result = await conn.execute(text("""
+            SELECT table_name, column_name 
+            FROM information_schema.columns 
+            WHERE table_schema = current_schema() 
+              AND column_name IN ('createdAt', 'updatedAt')
+        """))
+        
+        for table_name, column_name in result:
+            await conn.execute(text(f"""
+                ALTER TABLE "{table_name}" 
+                ALTER COLUMN "{column_name}" SET DEFAULT timezone('UTC', now())
+            """))
+        
+        # v5: covering indexy pro součty detailů proofu a položek faktury
+        for index_name, table_name, column_name, include_name in (
+            ("ix_proof_route_detail_proof", "ProofRouteDetail", "proofId", "totalAmount"),
+            ("ix_proof_linehaul_detail_proof", "ProofLinehaulDetail", "proofId", "totalAmount"),
+            ("ix_proof_depo_detail_proof", "ProofDepoDetail", "proofId", "totalAmount"),
+            ("ix_invoice_item_invoice", "InvoiceItem", "invoiceId", "amount"),
+        ):
+            await conn.execute(text(f"""
+                CREATE INDEX IF NOT EXISTS {index_name} 
+                ON "{table_name}" ("{column_name}") INCLUDE ("{include_name}")
+            """))
+        
+        # v6: indexy na cizí klíče (kaskádové mazání, selectin loadery);
+        #     nullable FK jako částečné indexy bez NULL řádků
+        for index_name, table_name, column_name, partial in (
+            ("ix_proof_depot", "Proof", "depotId", True),
+            ("ix_invoice_proof", "Invoice", "proofId", True),
+            ("ix_proof_analysis_proof", "ProofAnalysis", "proofId", False),
+            ("ix_price_config_contract", "PriceConfig", "contractId", True),
+            ("ix_fix_rate_price_config", "FixRate", "priceConfigId", False),
+            ("ix_km_rate_price_config", "KmRate", "priceConfigId", False),
+            ("ix_depo_rate_price_config", "DepoRate", "priceConfigId", False),
+            ("ix_linehaul_rate_price_config", "LinehaulRate", "priceConfigId", False),
+            ("ix_linehaul_rate_from_depot", "LinehaulRate", "fromDepotId", True),
+            ("ix_linehaul_rate_to_depot", "LinehaulRate", "toDepotId", True),
+            ("ix_bonus_rate_price_config", "BonusRate", "priceConfigId", False),
+        ):
+            where = f' WHERE "{column_name}" IS NOT NULL' if partial else ""
+            await conn.execute(text(f"""
+                CREATE INDEX IF NOT EXISTS {index_name} 
+                ON "{table_name}" ("{column_name}"){where}
+            """))
+        
+        # v7: částečný index pro vyhledání aktivního ceníku k datu
+        await conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS ix_price_config_active_window 
+            ON "PriceConfig" ("carrierId", "validFrom", "validTo") 
+            WHERE "isActive"
+        """))
+        
+        # v8: AuditLog - hodnoty jako JSONB, BRIN index na createdAt
+        result = await conn.execute(text("""
+            SELECT column_name 
+            FROM information_schema.columns 
+            WHERE table_name = 'AuditLog' AND data_type = 'text'
+        """))
+        text_columns = set(result.scalars())
+        
+        for column in ("oldValues", "newValues"):
+            if column in text_columns:
+                print(f"Migration: Converting AuditLog.{column} to JSONB...")
+                await conn.execute(text(f"""
+                    ALTER TABLE "AuditLog" 
+                    ALTER COLUMN "{column}" TYPE JSONB 
+                    USING NULLIF("{column}", '')::jsonb
+                """))
+        
+        await conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS ix_audit_log_created_brin 
+            ON "AuditLog" USING brin ("createdAt") WITH (pages_per_range = 32)
+        """))
+        
+        # v9: unikátní číslo faktury v rámci dopravce (nahrazuje SELECT před INSERT)
+        result = await conn.execute(text("""
+            SELECT 1 FROM information_schema.table_constraints 
+            WHERE table_name = 'Invoice' AND constraint_name = 'uq_invoice_carrier_number'
+        """))
+        
+        if result.first() is None:
+            # Duplicity z dřívějšího check-then-insert by ALTER shodily bez vysvětlení -
+            # faktury nemažeme automaticky, start selže s výpisem k ručnímu vyřešení
+            result = await conn.execute(text("""
+                SELECT "carrierId", "invoiceNumber", COUNT(*) 
+                FROM "Invoice" 
+                GROUP BY "carrierId", "invoiceNumber" 
+                HAVING COUNT(*) > 1
+                ORDER BY "carrierId", "invoiceNumber"
+            """))
+            duplicates = result.fetchall()
+            if duplicates:
+                listing = ", ".join(
+                    f"carrierId={carrier_id} invoiceNumber={number!r} ({count}x)"
+                    for carrier_id, number, count in duplicates
+                )
+                raise RuntimeError(
+                    "Migration v9: nelze přidat uq_invoice_carrier_number - duplicitní "
+                    f"čísla faktur: {listing}. Duplicity odstraňte ručně a restartujte aplikaci."
+                )
+            
+            print("Migration: Adding unique constraint on Invoice (carrierId, invoiceNumber)...")
+            
+            await conn.execute(text("""
+                ALTER TABLE "Invoice" 
+                ADD CONSTRAINT uq_invoice_carrier_number 
+                UNIQUE ("carrierId", "invoiceNumber")
+            """))
+        
+        # v10: zbývající indexy na cizí klíče (denní detaily proofu, trasy plánů, smlouvy)
+        for index_sql in (
+            'ix_contract_carrier ON "Contract" ("carrierId")',
+            'ix_proof_daily_detail_proof ON "ProofDailyDetail" ("proofId", "date")',
+            'ix_route_plan_route_plan ON "RoutePlanRoute" ("routePlanId")',
+            'ix_route_plan_route_route ON "RoutePlanRoute" ("routeId") WHERE "routeId" IS NOT NULL',
+            'ix_route_plan_route_depot ON "RoutePlanRoute" ("depotId") WHERE "depotId" IS NOT NULL',
+            'ix_route_plan_detail_route ON "RoutePlanDetail" ("routeId", "sequence")',
+            'ix_audit_log_entity ON "AuditLog" ("entityType", "entityId", "createdAt")',
+        ):
+            await conn.execute(text(f"CREATE INDEX IF NOT EXISTS {index_sql}"))
+        
+        # v11: časy tras z VARCHAR na TIME/INTERVAL (nevalidní řetězce -> NULL)
+        result = await conn.execute(text("""
+            SELECT table_name, column_name
+            FROM information_schema.columns
+            WHERE table_name IN ('RoutePlanRoute', 'RoutePlanDetail')
+              AND data_type = 'character varying'
+        """))
+        varchar_columns = set(result.all())
+        
+        for table, column, sql_type, pattern in (
+            ("RoutePlanRoute", "startTime", "TIME", r"^([01]?\d|2[0-3]):[0-5]\d(:[0-5]\d)?$"),
+            ("RoutePlanRoute", "endTime", "TIME", r"^([01]?\d|2[0-3]):[0-5]\d(:[0-5]\d)?$"),
+            ("RoutePlanRoute", "workTime", "INTERVAL", r"^\d+:[0-5]\d(:[0-5]\d)?$"),
+            ("RoutePlanDetail", "eta", "TIME", r"^([01]?\d|2[0-3]):[0-5]\d(:[0-5]\d)?$"),
+        ):
+            if (table, column) in varchar_columns:
+                print(f"Migration: Converting {table}.{column} to {sql_type}...")
+                await conn.execute(text(f"""
+                    ALTER TABLE "{table}" 
+                    ALTER COLUMN "{column}" TYPE {sql_type} 
+                    USING CASE WHEN "{column}" ~ '{pattern}' THEN "{column}"::{sql_type.lower()} END
+                """))
+        
+        await conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS ix_route_plan_route_start 
+            ON "RoutePlanRoute" ("depot", "startTime")
+        """))
+        
+        # v12: partial indexy na aktivní přiřazení tras (validTo IS NULL)
+        for index_sql in (
+            'ix_route_depot_current ON "RouteDepotHistory" ("routeId") INCLUDE ("depotId") WHERE "validTo" IS NULL',
+            'ix_route_carrier_current ON "RouteCarrierHistory" ("routeId") INCLUDE ("carrierId") WHERE "validTo" IS NULL',
+        ):
+            await conn.execute(text(f"CREATE INDEX IF NOT EXISTS {index_sql}"))
+        
+        # v13: výchozí validFrom/loginAt také z DB (jako createdAt v v4)
+        for table_name, column_name in (
+            ("Depot", "validFrom"),
+            ("RouteDepotHistory", "validFrom"),
+            ("RouteCarrierHistory", "validFrom"),
+            ("AlzaBoxAssignment", "validFrom"),
+            ("LoginLog", "loginAt"),
+        ):
+            await conn.execute(text(f"""
+                ALTER TABLE "{table_name}" 
+                ALTER COLUMN "{column_name}" SET DEFAULT timezone('UTC', now())
+            """))
+        
+        # v14: AlzaBoxDelivery - krycí index pro statistiky dopravce místo
+        # (carrierId, deliveryDate), bez duplicitních jednosloupcových indexů
+        await conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS ix_delivery_carrier_date_ontime 
+            ON "AlzaBoxDelivery" ("carrierId", "deliveryDate") INCLUDE ("onTime", "delayMinutes")
+        """))
+        for index_name in ("ix_delivery_carrier_date", "ix_AlzaBoxDelivery_boxId", "ix_AlzaBoxDelivery_deliveryDate"):
+            await conn.execute(text(f'DROP INDEX IF EXISTS "{index_name}"'))
+        
+        # Zapiš aktuální verzi schématu
+        if schema_version is None:
+            await conn.execute(
+                text('INSERT INTO "SchemaVersion" (version) VALUES (:version)'),
+                {"version": CURRENT_SCHEMA_VERSION}
+            )
+        else:
+            await conn.execute(
+                text('UPDATE "SchemaVersion" SET version = :version'),
+                {"version": CURRENT_SCHEMA_VERSION}
+            )
+        
+        print(f"Migration: schema version {schema_version} -> {CURRENT_SCHEMA_VERSION}")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: Create tables if they don't exist
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    # V produkci je schéma stabilní - při aktuální verzi přeskoč create_all
+    # (introspekce každé tabulky) i migrace
+    if IS_PRODUCTION:
+        async with engine.connect() as conn:
+            schema_version = await get_schema_version(conn)
+        skip_schema_setup = schema_version is not None and schema_version >= CURRENT_SCHEMA_VERSION
+    else:
+        skip_schema_setup = False
     
-    # Run migrations
-    await run_migrations()
+    if not skip_schema_setup:
+        # Startup: Create tables if they don't exist
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        
+        # Run migrations
+        await run_migrations()
     
     yield
     # Shutdown: dispose engine
     await engine.dispose()
 
 
-# Skrýt docs v produkci pokud je nastaven API_KEY
-IS_PRODUCTION = bool(os.getenv("API_KEY"))
-
 app = FastAPI(
     title="Alza Cost Control API",
     description="Backend API pro kontrolu nákladů na dopravu",
@@ -191,14 +412,10 @@ app = FastAPI(
 
 # CORS - configured for Railway deployment
 FRONTEND_URL = os.getenv("FRONTEND_URL", "")
-ALLOWED_ORIGINS = [
-    origin.strip() 
-    for origin in FRONTEND_URL.split(",") 
-    if origin.strip()
-]
+ALLOWED_ORIGINS = tuple(filter(None, map(str.strip, FRONTEND_URL.split(","))))
 
 if not ALLOWED_ORIGINS:
-    ALLOWED_ORIGINS = ["*"]
+    ALLOWED_ORIGINS = ("*",)
 
 app.add_middleware(
     CORSMiddleware,
@@ -208,8 +425,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# API Key authentication middleware
-app.add_middleware(APIKeyMiddleware)
+# Počet SQL dotazů na request - log v produkci, v testech (QUERY_BUDGET_STRICT)
+# překročení rozpočtu endpointu shodí request
+app.add_middleware(QueryBudgetASGIMiddleware, engine=engine)
+
+# API Key authentication middleware - jen v produkci, dev mód bez API_KEY
+# nemá v cestě requestu žádný middleware navíc
+if IS_PRODUCTION:
+    app.add_middleware(APIKeyASGIMiddleware)
 
 
 # Health check
@@ -218,16 +441,21 @@ async def health_check():
     return {"status": "ok", "version": "2.2.0"}
 
 
-# Routers
-app.include_router(auth.router, prefix="/api/auth", tags=["Auth"])
-app.include_router(carriers.router, prefix="/api/carriers", tags=["Carriers"])
-app.include_router(depots.router, prefix="/api/depots", tags=["Depots"])
-app.include_router(contracts.router, prefix="/api/contracts", tags=["Contracts"])
-app.include_router(prices.router, prefix="/api/prices", tags=["Prices"])
-app.include_router(proofs.router, prefix="/api/proofs", tags=["Proofs"])
-app.include_router(invoices.router, prefix="/api/invoices", tags=["Invoices"])
-app.include_router(analysis.router, prefix="/api/analysis", tags=["Analysis"])
-app.include_router(route_plans.router, prefix="/api/route-plans", tags=["Route Plans"])
-app.include_router(alzabox.router, prefix="/api/alzabox", tags=["AlzaBox"])
-app.include_router(routes.router, prefix="/api/routes", tags=["Routes"])
-app.include_router(expected_billing.router, prefix="/api/expected-billing", tags=["Expected Billing"])
+# Routers - (modul, prefix, tag)
+ROUTERS = [
+    (auth, "/api/auth", "Auth"),
+    (carriers, "/api/carriers", "Carriers"),
+    (depots, "/api/depots", "Depots"),
+    (contracts, "/api/contracts", "Contracts"),
+    (prices, "/api/prices", "Prices"),
+    (proofs, "/api/proofs", "Proofs"),
+    (invoices, "/api/invoices", "Invoices"),
+    (analysis, "/api/analysis", "Analysis"),
+    (route_plans, "/api/route-plans", "Route Plans"),
+    (alzabox, "/api/alzabox", "AlzaBox"),
+    (routes, "/api/routes", "Routes"),
+    (expected_billing, "/api/expected-billing", "Expected Billing"),
+]
+
+for module, prefix, tag in ROUTERS:
+    app.include_router(module.router, prefix=prefix, tags=[tag])
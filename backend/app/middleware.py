@@ -1,50 +1,153 @@
 """
-API Key Authentication Middleware
-Přidej tento soubor do backend/app/middleware.py
+API Key Authentication Middleware + počítadlo SQL dotazů na request
+
+Čistý ASGI middleware - nevytváří Request objekt ani task group
+jako BaseHTTPMiddleware, pracuje přímo se scope.
 """
+import hmac
+import logging
 import os
-from fastapi import Request, HTTPException
+from contextvars import ContextVar
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 API_KEY = os.getenv("API_KEY")
+_API_KEY_BYTES = API_KEY.encode() if API_KEY else b""
 
-# Endpointy, které nevyžadují autentizaci
-PUBLIC_PATHS = [
+# Endpointy, které nevyžadují autentizaci - přesná shoda (O(1) lookup v množině)
+PUBLIC_EXACT_PATHS = frozenset({
     "/health",
+    "/openapi.json",
+})
+
+# Endpointy s podcestami (Swagger/ReDoc assety) - shoda prefixem
+PUBLIC_PREFIXES = (
     "/docs",
     "/redoc",
-    "/openapi.json",
-]
-
-
-class APIKeyMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        # V development módu bez API_KEY povol vše
-        if not API_KEY:
-            return await call_next(request)
-        
-        # Povol OPTIONS requesty (CORS preflight)
-        if request.method == "OPTIONS":
-            return await call_next(request)
-        
-        # Povol veřejné endpointy
-        if any(request.url.path.startswith(path) for path in PUBLIC_PATHS):
-            return await call_next(request)
-        
-        # Zkontroluj API klíč
-        api_key = request.headers.get("X-API-Key")
-        
+)
+
+# Prefixy seskupené podle prvních dvou znaků - běžný /api/... request
+# skončí jedním lookupem ve slovníku bez porovnávání prefixů
+_PUBLIC_BY_PREFIX = {
+    key: tuple(path for path in PUBLIC_PREFIXES if path[:2] == key)
+    for key in {path[:2] for path in PUBLIC_PREFIXES}
+}
+
+
+def _is_public(path: str) -> bool:
+    if path in PUBLIC_EXACT_PATHS:
+        return True
+    bucket = _PUBLIC_BY_PREFIX.get(path[:2])
+    return bucket is not None and path.startswith(bucket)
+
+
+class APIKeyASGIMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        # Websocket/lifespan propouštíme (bez API_KEY se middleware vůbec neregistruje)
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Povol OPTIONS requesty (CORS preflight) a veřejné endpointy
+        if scope["method"] == "OPTIONS" or _is_public(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        # Zkontroluj API klíč (ASGI hlavičky jsou lowercase bytes)
+        api_key = dict(scope["headers"]).get(b"x-api-key")
+
         if not api_key:
-            return JSONResponse(
+            response = JSONResponse(
                 status_code=401,
                 content={"detail": "Missing API key. Include 'X-API-Key' header."}
             )
-        
-        if api_key != API_KEY:
-            return JSONResponse(
+            await response(scope, receive, send)
+            return
+
+        if not hmac.compare_digest(api_key, _API_KEY_BYTES):
+            response = JSONResponse(
                 status_code=403,
                 content={"detail": "Invalid API key"}
             )
-        
-        return await call_next(request)
+            await response(scope, receive, send)
+            return
+
+        await self.app(scope, receive, send)
+
+
+# =============================================================================
+# QUERY BUDGET - hlídání N+1 regresí
+# =============================================================================
+
+logger = logging.getLogger(__name__)
+
+# QUERY_BUDGET_STRICT=1 (testy/CI) - překročení rozpočtu vyhodí AssertionError,
+# jinak se počet dotazů jen loguje jako strukturované pole
+QUERY_BUDGET_STRICT = os.getenv("QUERY_BUDGET_STRICT") == "1"
+
+# Maximální počet SQL dotazů na endpoint - (metoda, šablona cesty) -> limit.
+# Po přidání vztahu bez eager loadingu (nebo nového endpointu s N+1) počet
+# roste s počtem řádků a rozpočet se překročí.
+QUERY_BUDGETS = {
+    # Proof (+ joined carrier/depot) + 5 selectin kolekcí + položky faktur
+    ("GET", "/api/proofs/{proof_id}"): 8,
+    ("GET", "/api/proofs"): 1,
+    ("GET", "/api/proofs/{proof_id}/daily"): 2,
+    ("GET", "/api/invoices"): 2,
+    ("GET", "/api/invoices/{invoice_id}"): 2,
+    ("GET", "/api/analysis/summary"): 3,
+}
+
+# Počítadlo aktuálního requestu - list kvůli mutaci z greenletu async session
+_query_counter: ContextVar = ContextVar("query_counter", default=None)
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    counter = _query_counter.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+def track_queries(engine: AsyncEngine) -> None:
+    """Započítává dotazy enginu do rozpočtu requestu (idempotentní)."""
+    if not event.contains(engine.sync_engine, "before_cursor_execute", _count_query):
+        event.listen(engine.sync_engine, "before_cursor_execute", _count_query)
+
+
+class QueryBudgetASGIMiddleware:
+    def __init__(self, app: ASGIApp, engine: AsyncEngine):
+        self.app = app
+        track_queries(engine)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        counter = [0]
+        token = _query_counter.set(counter)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _query_counter.reset(token)
+
+        # Router doplní do scope matchnutou routu - rozpočet podle šablony cesty
+        route = scope.get("route")
+        route_path = getattr(route, "path", scope["path"])
+        budget = QUERY_BUDGETS.get((scope["method"], route_path))
+        count = counter[0]
+
+        logger.info(
+            "query_count",
+            extra={"method": scope["method"], "route": route_path, "query_count": count},
+        )
+        if budget is not None and count > budget:
+            message = f"{scope['method']} {route_path}: {count} SQL dotazů (rozpočet {budget})"
+            if QUERY_BUDGET_STRICT:
+                raise AssertionError(message)
+            logger.warning(message)
@@ -5,15 +5,43 @@ Updated: 2025-12-08 - Added Route, RouteDepotHistory, RouteCarrierHistory, Depot
                       FIXED: Restored InvoiceItem model
 Updated: 2025-12-09 - Fixed AlzaBox model: box_id→code, added alza_id, removed address/zip_code
 """
-from datetime import datetime
+import os
+from datetime import datetime, time, timedelta
 from decimal import Decimal
-from typing import Optional, List
-from sqlalchemy import String, Integer, Boolean, DateTime, ForeignKey, Index, Text, Numeric, UniqueConstraint, CheckConstraint
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from typing import Any, Optional, List
+from sqlalchemy import String, Integer, Boolean, DateTime, Time, Interval, ForeignKey, Index, Text, Numeric, UniqueConstraint, CheckConstraint, bindparam, func, or_, select, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Mapped, QueryableAttribute, configure_mappers, joinedload, mapped_column, raiseload, relationship, selectinload
 
 from app.database import Base
 
 
+# Kolekce bez eager loadingu - v testech/CI (QUERY_BUDGET_STRICT=1) vyhodí přístup
+# k nenačtené kolekci chybu hned (N+1 se nedostane dál), jinak výchozí lazy load
+DEFAULT_LAZY = "raise_on_sql" if os.getenv("QUERY_BUDGET_STRICT") == "1" else "select"
+
+
+def with_loaded(*paths) -> tuple:
+    """
+    Loader options pro dotaz: vyjmenované vztahy se načtou (atribut -> selectinload,
+    hotová option např. joinedload(...) se použije jak je), vše ostatní raiseload.
+    
+    Vypne i výchozí selectin/joined vztahy modelu - přístup k čemukoli
+    nevyjmenovanému skončí chybou místo tichého N+1 (pokrývají testy endpointů).
+    """
+    options = tuple(
+        selectinload(path) if isinstance(path, QueryableAttribute) else path
+        for path in paths
+    )
+    return (*options, raiseload("*"))
+
+
+# createdAt/updatedAt (a výchozí validFrom/loginAt) vyplňuje DB (UTC jako dřívější
+# datetime.utcnow) - hromadné inserty tak nemusí posílat časové razítko za každý řádek
+UTC_NOW = func.timezone('UTC', func.now())
+
+
 # =============================================================================
 # WAREHOUSE MODEL
 # =============================================================================
@@ -30,7 +58,7 @@ class Warehouse(Base):
     longitude: Mapped[Optional[Decimal]] = mapped_column(Numeric(10, 7))
     warehouse_type: Mapped[str] = mapped_column("warehouseType", String(50), default='MAIN')
     is_active: Mapped[bool] = mapped_column("isActive", Boolean, default=True)
-    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, server_default=UTC_NOW)
 
     # Relationships
     linehaul_from: Mapped[List["LinehaulRate"]] = relationship(
@@ -56,21 +84,24 @@ class Carrier(Base):
     dic: Mapped[Optional[str]] = mapped_column(String(20))
     address: Mapped[Optional[str]] = mapped_column(Text)
     contact: Mapped[Optional[str]] = mapped_column(Text)
-    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, default=datetime.utcnow)
-    updated_at: Mapped[datetime] = mapped_column("updatedAt", DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, server_default=UTC_NOW)
+    updated_at: Mapped[datetime] = mapped_column("updatedAt", DateTime, server_default=UTC_NOW, onupdate=datetime.utcnow)
 
     # Relationships
+    # depots/contracts/prices se načítají vždy explicitně (selectinload) - implicitní
+    # lazy load by v seznamu dopravců znamenal N+1, proto raise_on_sql
     depots: Mapped[List["Depot"]] = relationship(
         back_populates="carrier", 
         foreign_keys="Depot.carrier_id",
-        cascade="all, delete-orphan"
+        cascade="all, delete-orphan",
+        lazy="raise_on_sql"
     )
     operated_depots: Mapped[List["Depot"]] = relationship(
         back_populates="operator_carrier",
         foreign_keys="Depot.operator_carrier_id"
     )
-    contracts: Mapped[List["Contract"]] = relationship(back_populates="carrier", cascade="all, delete-orphan")
-    prices: Mapped[List["PriceConfig"]] = relationship(back_populates="carrier", cascade="all, delete-orphan")
+    contracts: Mapped[List["Contract"]] = relationship(back_populates="carrier", cascade="all, delete-orphan", lazy="raise_on_sql")
+    prices: Mapped[List["PriceConfig"]] = relationship(back_populates="carrier", cascade="all, delete-orphan", lazy="raise_on_sql")
     proofs: Mapped[List["Proof"]] = relationship(back_populates="carrier", cascade="all, delete-orphan")
     invoices: Mapped[List["Invoice"]] = relationship(back_populates="carrier", cascade="all, delete-orphan")
     route_plans: Mapped[List["RoutePlan"]] = relationship(back_populates="carrier", cascade="all, delete-orphan")
@@ -111,13 +142,13 @@ class Depot(Base):
     )
     
     # NEW: Validity period (depo může vzniknout/zaniknout)
-    valid_from: Mapped[datetime] = mapped_column("validFrom", DateTime, default=datetime.utcnow)
+    valid_from: Mapped[datetime] = mapped_column("validFrom", DateTime, server_default=UTC_NOW)
     valid_to: Mapped[Optional[datetime]] = mapped_column("validTo", DateTime, nullable=True)
     
     # NEW: Location code (CZLC4, CZTC1 pro ALZA depa)
     location_code: Mapped[Optional[str]] = mapped_column("locationCode", String(20))
     
-    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, server_default=UTC_NOW)
 
     # Relationships
     carrier: Mapped[Optional["Carrier"]] = relationship(
@@ -129,21 +160,21 @@ class Depot(Base):
         foreign_keys=[operator_carrier_id]
     )
     linehaul_from: Mapped[List["LinehaulRate"]] = relationship(
-        back_populates="from_depot", foreign_keys="LinehaulRate.from_depot_id"
+        back_populates="from_depot", foreign_keys="LinehaulRate.from_depot_id", lazy=DEFAULT_LAZY
     )
     linehaul_to: Mapped[List["LinehaulRate"]] = relationship(
-        back_populates="to_depot", foreign_keys="LinehaulRate.to_depot_id"
-    )
-    proofs: Mapped[List["Proof"]] = relationship(back_populates="depot")
-    start_location_mappings: Mapped[List["StartLocationMapping"]] = relationship(back_populates="depot")
-    route_name_mappings: Mapped[List["RouteNameMapping"]] = relationship(back_populates="depot")
-    depot_name_mappings: Mapped[List["DepotNameMapping"]] = relationship(back_populates="depot")
-    fix_rates: Mapped[List["FixRate"]] = relationship(back_populates="depot", foreign_keys="FixRate.depot_id")
-    km_rates: Mapped[List["KmRate"]] = relationship(back_populates="depot", foreign_keys="KmRate.depot_id")
-    depo_rates_by_depot: Mapped[List["DepoRate"]] = relationship(back_populates="depot", foreign_keys="DepoRate.depot_id")
-    bonus_rates: Mapped[List["BonusRate"]] = relationship(back_populates="depot", foreign_keys="BonusRate.depot_id")
-    route_depot_history: Mapped[List["RouteDepotHistory"]] = relationship(back_populates="depot")
-    route_plan_routes: Mapped[List["RoutePlanRoute"]] = relationship(back_populates="depot_ref")
+        back_populates="to_depot", foreign_keys="LinehaulRate.to_depot_id", lazy=DEFAULT_LAZY
+    )
+    proofs: Mapped[List["Proof"]] = relationship(back_populates="depot", lazy=DEFAULT_LAZY)
+    start_location_mappings: Mapped[List["StartLocationMapping"]] = relationship(back_populates="depot", lazy=DEFAULT_LAZY)
+    route_name_mappings: Mapped[List["RouteNameMapping"]] = relationship(back_populates="depot", lazy=DEFAULT_LAZY)
+    depot_name_mappings: Mapped[List["DepotNameMapping"]] = relationship(back_populates="depot", lazy=DEFAULT_LAZY)
+    fix_rates: Mapped[List["FixRate"]] = relationship(back_populates="depot", foreign_keys="FixRate.depot_id", lazy=DEFAULT_LAZY)
+    km_rates: Mapped[List["KmRate"]] = relationship(back_populates="depot", foreign_keys="KmRate.depot_id", lazy=DEFAULT_LAZY)
+    depo_rates_by_depot: Mapped[List["DepoRate"]] = relationship(back_populates="depot", foreign_keys="DepoRate.depot_id", lazy=DEFAULT_LAZY)
+    bonus_rates: Mapped[List["BonusRate"]] = relationship(back_populates="depot", foreign_keys="BonusRate.depot_id", lazy=DEFAULT_LAZY)
+    route_depot_history: Mapped[List["RouteDepotHistory"]] = relationship(back_populates="depot", lazy=DEFAULT_LAZY)
+    route_plan_routes: Mapped[List["RoutePlanRoute"]] = relationship(back_populates="depot_ref", lazy=DEFAULT_LAZY)
 
     __table_args__ = (
         CheckConstraint("\"operatorType\" IN ('ALZA', 'CARRIER')", name="chk_operator_type"),
@@ -167,7 +198,7 @@ class DepotNameMapping(Base):
     id: Mapped[int] = mapped_column(primary_key=True)
     plan_name: Mapped[str] = mapped_column("planName", String(100), unique=True, nullable=False)
     depot_id: Mapped[int] = mapped_column("depotId", ForeignKey("Depot.id", ondelete="CASCADE"), nullable=False)
-    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, server_default=UTC_NOW)
 
     # Relationships
     depot: Mapped["Depot"] = relationship(back_populates="depot_name_mappings")
@@ -190,14 +221,14 @@ class Route(Base):
     region: Mapped[Optional[str]] = mapped_column(String(100))
     description: Mapped[Optional[str]] = mapped_column(Text)
     is_active: Mapped[bool] = mapped_column("isActive", Boolean, default=True)
-    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, default=datetime.utcnow)
-    updated_at: Mapped[datetime] = mapped_column("updatedAt", DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, server_default=UTC_NOW)
+    updated_at: Mapped[datetime] = mapped_column("updatedAt", DateTime, server_default=UTC_NOW, onupdate=datetime.utcnow)
 
     # Relationships
-    depot_history: Mapped[List["RouteDepotHistory"]] = relationship(back_populates="route", cascade="all, delete-orphan")
-    carrier_history: Mapped[List["RouteCarrierHistory"]] = relationship(back_populates="route", cascade="all, delete-orphan")
-    box_assignments: Mapped[List["AlzaBoxAssignment"]] = relationship(back_populates="route")
-    route_plan_routes: Mapped[List["RoutePlanRoute"]] = relationship(back_populates="route_ref")
+    depot_history: Mapped[List["RouteDepotHistory"]] = relationship(back_populates="route", cascade="all, delete-orphan", lazy=DEFAULT_LAZY)
+    carrier_history: Mapped[List["RouteCarrierHistory"]] = relationship(back_populates="route", cascade="all, delete-orphan", lazy=DEFAULT_LAZY)
+    box_assignments: Mapped[List["AlzaBoxAssignment"]] = relationship(back_populates="route", lazy=DEFAULT_LAZY)
+    route_plan_routes: Mapped[List["RoutePlanRoute"]] = relationship(back_populates="route_ref", lazy=DEFAULT_LAZY)
 
     __table_args__ = (
         Index('ix_route_name', 'routeName'),
@@ -205,7 +236,7 @@ class Route(Base):
     )
 
     def get_current_depot(self, as_of: datetime = None) -> Optional["Depot"]:
-        """Vrátí aktuální depo pro tuto trasu."""
+        """Vrátí aktuální depo pro tuto trasu (z již načtené depot_history)."""
         if as_of is None:
             as_of = datetime.utcnow()
         for history in self.depot_history:
@@ -214,7 +245,7 @@ class Route(Base):
         return None
 
     def get_current_carrier(self, as_of: datetime = None) -> Optional["Carrier"]:
-        """Vrátí aktuálního dopravce pro tuto trasu."""
+        """Vrátí aktuálního dopravce pro tuto trasu (z již načtené carrier_history)."""
         if as_of is None:
             as_of = datetime.utcnow()
         for history in self.carrier_history:
@@ -222,6 +253,49 @@ class Route(Base):
                 return history.carrier
         return None
 
+    @classmethod
+    def query_with_current(cls, as_of: datetime = None):
+        """
+        Select tras s načtenými jen aktuálně platnými záznamy historie (+ depo/dopravce).
+        Tři dotazy celkem bez ohledu na počet tras, get_current_* pak čtou jediný řádek.
+        """
+        if as_of is None:
+            as_of = datetime.utcnow()
+        return select(cls).options(
+            selectinload(cls.depot_history.and_(
+                RouteDepotHistory.valid_from <= as_of,
+                or_(RouteDepotHistory.valid_to.is_(None), RouteDepotHistory.valid_to > as_of),
+            )).joinedload(RouteDepotHistory.depot),
+            selectinload(cls.carrier_history.and_(
+                RouteCarrierHistory.valid_from <= as_of,
+                or_(RouteCarrierHistory.valid_to.is_(None), RouteCarrierHistory.valid_to > as_of),
+            )).joinedload(RouteCarrierHistory.carrier),
+        )
+
+    @classmethod
+    async def current_depot(
+        cls, session: AsyncSession, route_id: int, as_of: datetime = None
+    ) -> Optional["Depot"]:
+        """Vrátí aktuální depo trasy jedním dotazem - bez načítání celé historie."""
+        if as_of is None:
+            as_of = datetime.utcnow()
+        result = await session.execute(
+            _CURRENT_DEPOT_STMT, {"route_id": route_id, "as_of": as_of}
+        )
+        return result.scalar_one_or_none()
+
+    @classmethod
+    async def current_carrier(
+        cls, session: AsyncSession, route_id: int, as_of: datetime = None
+    ) -> Optional["Carrier"]:
+        """Vrátí aktuálního dopravce trasy jedním dotazem - bez načítání celé historie."""
+        if as_of is None:
+            as_of = datetime.utcnow()
+        result = await session.execute(
+            _CURRENT_CARRIER_STMT, {"route_id": route_id, "as_of": as_of}
+        )
+        return result.scalar_one_or_none()
+
 
 # =============================================================================
 # ROUTE DEPOT HISTORY MODEL (NEW)
@@ -237,9 +311,9 @@ class RouteDepotHistory(Base):
     id: Mapped[int] = mapped_column(primary_key=True)
     route_id: Mapped[int] = mapped_column("routeId", ForeignKey("Route.id", ondelete="CASCADE"), nullable=False)
     depot_id: Mapped[int] = mapped_column("depotId", ForeignKey("Depot.id", ondelete="CASCADE"), nullable=False)
-    valid_from: Mapped[datetime] = mapped_column("validFrom", DateTime, nullable=False, default=datetime.utcnow)
+    valid_from: Mapped[datetime] = mapped_column("validFrom", DateTime, nullable=False, server_default=UTC_NOW)
     valid_to: Mapped[Optional[datetime]] = mapped_column("validTo", DateTime, nullable=True)
-    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, server_default=UTC_NOW)
 
     # Relationships
     route: Mapped["Route"] = relationship(back_populates="depot_history")
@@ -250,6 +324,8 @@ class RouteDepotHistory(Base):
         Index('ix_route_depot_route', 'routeId'),
         Index('ix_route_depot_depot', 'depotId'),
         Index('ix_route_depot_valid', 'validFrom', 'validTo'),
+        # Aktivní přiřazení (validTo IS NULL) - index jen přes aktuální řádky
+        Index('ix_route_depot_current', 'routeId', postgresql_where=text('"validTo" IS NULL'), postgresql_include=['depotId']),
     )
 
 
@@ -267,9 +343,9 @@ class RouteCarrierHistory(Base):
     id: Mapped[int] = mapped_column(primary_key=True)
     route_id: Mapped[int] = mapped_column("routeId", ForeignKey("Route.id", ondelete="CASCADE"), nullable=False)
     carrier_id: Mapped[int] = mapped_column("carrierId", ForeignKey("Carrier.id", ondelete="CASCADE"), nullable=False)
-    valid_from: Mapped[datetime] = mapped_column("validFrom", DateTime, nullable=False, default=datetime.utcnow)
+    valid_from: Mapped[datetime] = mapped_column("validFrom", DateTime, nullable=False, server_default=UTC_NOW)
     valid_to: Mapped[Optional[datetime]] = mapped_column("validTo", DateTime, nullable=True)
-    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, server_default=UTC_NOW)
 
     # Relationships
     route: Mapped["Route"] = relationship(back_populates="carrier_history")
@@ -280,6 +356,8 @@ class RouteCarrierHistory(Base):
         Index('ix_route_carrier_route', 'routeId'),
         Index('ix_route_carrier_carrier', 'carrierId'),
         Index('ix_route_carrier_valid', 'validFrom', 'validTo'),
+        # Aktivní přiřazení (validTo IS NULL) - index jen přes aktuální řádky
+        Index('ix_route_carrier_current', 'routeId', postgresql_where=text('"validTo" IS NULL'), postgresql_include=['carrierId']),
     )
 
 
@@ -297,7 +375,7 @@ class StartLocationMapping(Base):
     warehouse_id: Mapped[Optional[int]] = mapped_column("warehouseId", ForeignKey("Warehouse.id"))
     depot_id: Mapped[Optional[int]] = mapped_column("depotId", ForeignKey("Depot.id"))
     route_category: Mapped[str] = mapped_column("routeCategory", String(50), nullable=False)
-    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, server_default=UTC_NOW)
 
     # Relationships
     warehouse: Mapped[Optional["Warehouse"]] = relationship(back_populates="start_location_mappings")
@@ -315,7 +393,7 @@ class RouteNameMapping(Base):
     id: Mapped[int] = mapped_column(primary_key=True)
     route_prefix: Mapped[str] = mapped_column("routePrefix", String(50), nullable=False)
     depot_id: Mapped[int] = mapped_column("depotId", ForeignKey("Depot.id"), nullable=False)
-    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, server_default=UTC_NOW)
 
     # Relationships
     depot: Mapped["Depot"] = relationship(back_populates="route_name_mappings")
@@ -337,12 +415,16 @@ class Contract(Base):
     document_url: Mapped[Optional[str]] = mapped_column("documentUrl", Text)
     notes: Mapped[Optional[str]] = mapped_column(Text)
     amendment_number: Mapped[Optional[int]] = mapped_column("amendmentNumber", Integer, nullable=True)
-    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, server_default=UTC_NOW)
 
     # Relationships
     carrier: Mapped["Carrier"] = relationship(back_populates="contracts")
     prices: Mapped[List["PriceConfig"]] = relationship(back_populates="contract")
 
+    __table_args__ = (
+        Index('ix_contract_carrier', 'carrierId'),
+    )
+
 
 # =============================================================================
 # PRICE CONFIG MODEL
@@ -358,18 +440,25 @@ class PriceConfig(Base):
     valid_to: Mapped[Optional[datetime]] = mapped_column("validTo", DateTime)
     type: Mapped[Optional[str]] = mapped_column(String(50))
     name: Mapped[Optional[str]] = mapped_column(String(100))
-    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, default=datetime.utcnow)
-    updated_at: Mapped[datetime] = mapped_column("updatedAt", DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, server_default=UTC_NOW)
+    updated_at: Mapped[datetime] = mapped_column("updatedAt", DateTime, server_default=UTC_NOW, onupdate=datetime.utcnow)
     is_active: Mapped[bool] = mapped_column("isActive", Boolean, default=True)
 
     # Relationships
     carrier: Mapped["Carrier"] = relationship(back_populates="prices")
     contract: Mapped[Optional["Contract"]] = relationship(back_populates="prices")
-    fix_rates: Mapped[List["FixRate"]] = relationship(back_populates="price_config", cascade="all, delete-orphan")
-    km_rates: Mapped[List["KmRate"]] = relationship(back_populates="price_config", cascade="all, delete-orphan")
-    depo_rates: Mapped[List["DepoRate"]] = relationship(back_populates="price_config", cascade="all, delete-orphan")
-    linehaul_rates: Mapped[List["LinehaulRate"]] = relationship(back_populates="price_config", cascade="all, delete-orphan")
-    bonus_rates: Mapped[List["BonusRate"]] = relationship(back_populates="price_config", cascade="all, delete-orphan")
+    fix_rates: Mapped[List["FixRate"]] = relationship(back_populates="price_config", cascade="all, delete-orphan", lazy="selectin")
+    km_rates: Mapped[List["KmRate"]] = relationship(back_populates="price_config", cascade="all, delete-orphan", lazy="selectin")
+    depo_rates: Mapped[List["DepoRate"]] = relationship(back_populates="price_config", cascade="all, delete-orphan", lazy="selectin")
+    linehaul_rates: Mapped[List["LinehaulRate"]] = relationship(back_populates="price_config", cascade="all, delete-orphan", lazy="selectin")
+    bonus_rates: Mapped[List["BonusRate"]] = relationship(back_populates="price_config", cascade="all, delete-orphan", lazy="selectin")
+
+    __table_args__ = (
+        # Nullable FK - částečný index bez NULL řádků
+        Index('ix_price_config_contract', 'contractId', postgresql_where=text('"contractId" IS NOT NULL')),
+        # Aktivní ceník dopravce platný k datu - neaktivní ceníky v indexu vůbec nejsou
+        Index('ix_price_config_active_window', 'carrierId', 'validFrom', 'validTo', postgresql_where=text('"isActive"')),
+    )
 
 
 # =============================================================================
@@ -385,12 +474,16 @@ class FixRate(Base):
     delivery_type: Mapped[str] = mapped_column("deliveryType", String(50))
     rate: Mapped[Decimal] = mapped_column(Numeric(10, 2))
     depot_id: Mapped[Optional[int]] = mapped_column("depotId", ForeignKey("Depot.id"))
-    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, server_default=UTC_NOW)
 
     # Relationships
     price_config: Mapped["PriceConfig"] = relationship(back_populates="fix_rates")
     depot: Mapped[Optional["Depot"]] = relationship(back_populates="fix_rates", foreign_keys=[depot_id])
 
+    __table_args__ = (
+        Index('ix_fix_rate_price_config', 'priceConfigId'),
+    )
+
 
 class KmRate(Base):
     __tablename__ = "KmRate"
@@ -401,12 +494,16 @@ class KmRate(Base):
     delivery_type: Mapped[str] = mapped_column("deliveryType", String(50))
     rate: Mapped[Decimal] = mapped_column(Numeric(10, 4))
     depot_id: Mapped[Optional[int]] = mapped_column("depotId", ForeignKey("Depot.id"))
-    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, server_default=UTC_NOW)
 
     # Relationships
     price_config: Mapped["PriceConfig"] = relationship(back_populates="km_rates")
     depot: Mapped[Optional["Depot"]] = relationship(back_populates="km_rates", foreign_keys=[depot_id])
 
+    __table_args__ = (
+        Index('ix_km_rate_price_config', 'priceConfigId'),
+    )
+
 
 class DepoRate(Base):
     __tablename__ = "DepoRate"
@@ -418,12 +515,16 @@ class DepoRate(Base):
     service_type: Mapped[Optional[str]] = mapped_column("serviceType", String(100))
     rate: Mapped[Decimal] = mapped_column(Numeric(10, 2))
     depot_id: Mapped[Optional[int]] = mapped_column("depotId", ForeignKey("Depot.id"))
-    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, server_default=UTC_NOW)
 
     # Relationships
     price_config: Mapped["PriceConfig"] = relationship(back_populates="depo_rates")
     depot: Mapped[Optional["Depot"]] = relationship(back_populates="depo_rates_by_depot", foreign_keys=[depot_id])
 
+    __table_args__ = (
+        Index('ix_depo_rate_price_config', 'priceConfigId'),
+    )
+
 
 class LinehaulRate(Base):
     __tablename__ = "LinehaulRate"
@@ -439,7 +540,7 @@ class LinehaulRate(Base):
     rate: Mapped[Decimal] = mapped_column(Numeric(10, 2))
     pallet_capacity_min: Mapped[Optional[int]] = mapped_column("palletCapacityMin", Integer)
     pallet_capacity_max: Mapped[Optional[int]] = mapped_column("palletCapacityMax", Integer)
-    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, server_default=UTC_NOW)
 
     # Relationships
     price_config: Mapped["PriceConfig"] = relationship(back_populates="linehaul_rates")
@@ -447,6 +548,12 @@ class LinehaulRate(Base):
     to_depot: Mapped[Optional["Depot"]] = relationship(back_populates="linehaul_to", foreign_keys=[to_depot_id])
     from_warehouse: Mapped[Optional["Warehouse"]] = relationship(back_populates="linehaul_from", foreign_keys=[from_warehouse_id])
 
+    __table_args__ = (
+        Index('ix_linehaul_rate_price_config', 'priceConfigId'),
+        Index('ix_linehaul_rate_from_depot', 'fromDepotId', postgresql_where=text('"fromDepotId" IS NOT NULL')),
+        Index('ix_linehaul_rate_to_depot', 'toDepotId', postgresql_where=text('"toDepotId" IS NOT NULL')),
+    )
+
 
 class BonusRate(Base):
     __tablename__ = "BonusRate"
@@ -458,12 +565,16 @@ class BonusRate(Base):
     bonus_amount: Mapped[Decimal] = mapped_column("bonusAmount", Numeric(10, 2))
     total_with_bonus: Mapped[Decimal] = mapped_column("totalWithBonus", Numeric(10, 2))
     depot_id: Mapped[Optional[int]] = mapped_column("depotId", ForeignKey("Depot.id"))
-    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, server_default=UTC_NOW)
 
     # Relationships
     price_config: Mapped["PriceConfig"] = relationship(back_populates="bonus_rates")
     depot: Mapped[Optional["Depot"]] = relationship(back_populates="bonus_rates", foreign_keys=[depot_id])
 
+    __table_args__ = (
+        Index('ix_bonus_rate_price_config', 'priceConfigId'),
+    )
+
 
 # =============================================================================
 # PROOF MODEL
@@ -487,18 +598,25 @@ class Proof(Base):
     total_bonus: Mapped[Optional[Decimal]] = mapped_column("totalBonus", Numeric(12, 2))
     total_penalty: Mapped[Optional[Decimal]] = mapped_column("totalPenalty", Numeric(12, 2))
     grand_total: Mapped[Optional[Decimal]] = mapped_column("grandTotal", Numeric(12, 2))
-    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, default=datetime.utcnow)
-    updated_at: Mapped[datetime] = mapped_column("updatedAt", DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, server_default=UTC_NOW)
+    updated_at: Mapped[datetime] = mapped_column("updatedAt", DateTime, server_default=UTC_NOW, onupdate=datetime.utcnow)
 
     # Relationships
-    carrier: Mapped["Carrier"] = relationship(back_populates="proofs")
-    depot: Mapped[Optional["Depot"]] = relationship(back_populates="proofs")
-    route_details: Mapped[List["ProofRouteDetail"]] = relationship(back_populates="proof", cascade="all, delete-orphan")
-    linehaul_details: Mapped[List["ProofLinehaulDetail"]] = relationship(back_populates="proof", cascade="all, delete-orphan")
-    depo_details: Mapped[List["ProofDepoDetail"]] = relationship(back_populates="proof", cascade="all, delete-orphan")
-    daily_details: Mapped[List["ProofDailyDetail"]] = relationship(back_populates="proof", cascade="all, delete-orphan")
-    invoices: Mapped[List["Invoice"]] = relationship(back_populates="proof")
-    analyses: Mapped[List["ProofAnalysis"]] = relationship(back_populates="proof", cascade="all, delete-orphan")
+    # Many-to-one se serializují skoro vždy - JOIN v hlavním dotazu místo dalšího round-tripu
+    carrier: Mapped["Carrier"] = relationship(back_populates="proofs", lazy="joined", innerjoin=True)
+    depot: Mapped[Optional["Depot"]] = relationship(back_populates="proofs", lazy="joined")
+    route_details: Mapped[List["ProofRouteDetail"]] = relationship(back_populates="proof", cascade="all, delete-orphan", lazy="selectin")
+    linehaul_details: Mapped[List["ProofLinehaulDetail"]] = relationship(back_populates="proof", cascade="all, delete-orphan", lazy="selectin")
+    depo_details: Mapped[List["ProofDepoDetail"]] = relationship(back_populates="proof", cascade="all, delete-orphan", lazy="selectin")
+    daily_details: Mapped[List["ProofDailyDetail"]] = relationship(back_populates="proof", cascade="all, delete-orphan", lazy=DEFAULT_LAZY)
+    invoices: Mapped[List["Invoice"]] = relationship(back_populates="proof", lazy="selectin")
+    analyses: Mapped[List["ProofAnalysis"]] = relationship(back_populates="proof", cascade="all, delete-orphan", lazy="selectin")
+
+    __table_args__ = (
+        # Dashboard filtruje carrier + period a řadí podle periodDate
+        Index('ix_proof_carrier_period', 'carrierId', 'period', 'periodDate'),
+        Index('ix_proof_depot', 'depotId', postgresql_where=text('"depotId" IS NOT NULL')),
+    )
 
 
 # =============================================================================
@@ -517,10 +635,15 @@ class ProofRouteDetail(Base):
     fix_amount: Mapped[Optional[Decimal]] = mapped_column("fixAmount", Numeric(10, 2))
     km_amount: Mapped[Optional[Decimal]] = mapped_column("kmAmount", Numeric(10, 2))
     total_amount: Mapped[Optional[Decimal]] = mapped_column("totalAmount", Numeric(10, 2))
-    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, server_default=UTC_NOW)
 
     proof: Mapped["Proof"] = relationship(back_populates="route_details")
 
+    __table_args__ = (
+        # INCLUDE - součet částek za proof jde čistě z indexu (index-only scan)
+        Index('ix_proof_route_detail_proof', 'proofId', postgresql_include=['totalAmount']),
+    )
+
 
 class ProofLinehaulDetail(Base):
     __tablename__ = "ProofLinehaulDetail"
@@ -533,10 +656,14 @@ class ProofLinehaulDetail(Base):
     trips_count: Mapped[int] = mapped_column("tripsCount", Integer, default=0)
     rate: Mapped[Decimal] = mapped_column(Numeric(10, 2))
     total_amount: Mapped[Decimal] = mapped_column("totalAmount", Numeric(10, 2))
-    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, server_default=UTC_NOW)
 
     proof: Mapped["Proof"] = relationship(back_populates="linehaul_details")
 
+    __table_args__ = (
+        Index('ix_proof_linehaul_detail_proof', 'proofId', postgresql_include=['totalAmount']),
+    )
+
 
 class ProofDepoDetail(Base):
     __tablename__ = "ProofDepoDetail"
@@ -548,10 +675,14 @@ class ProofDepoDetail(Base):
     quantity: Mapped[Decimal] = mapped_column(Numeric(10, 2), default=0)
     rate: Mapped[Decimal] = mapped_column(Numeric(10, 2))
     total_amount: Mapped[Decimal] = mapped_column("totalAmount", Numeric(10, 2))
-    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, server_default=UTC_NOW)
 
     proof: Mapped["Proof"] = relationship(back_populates="depo_details")
 
+    __table_args__ = (
+        Index('ix_proof_depo_detail_proof', 'proofId', postgresql_include=['totalAmount']),
+    )
+
 
 class ProofDailyDetail(Base):
     __tablename__ = "ProofDailyDetail"
@@ -589,10 +720,14 @@ class ProofDailyDetail(Base):
     bydzov_lh_dpo_km: Mapped[Optional[Decimal]] = mapped_column("bydzovLhDpoKm", Numeric(10, 2), default=0)
     bydzov_dr_sd_km: Mapped[Optional[Decimal]] = mapped_column("bydzovDrSdKm", Numeric(10, 2), default=0)
     bydzov_lh_sd_km: Mapped[Optional[Decimal]] = mapped_column("bydzovLhSdKm", Numeric(10, 2), default=0)
-    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, server_default=UTC_NOW)
 
     proof: Mapped["Proof"] = relationship(back_populates="daily_details")
 
+    __table_args__ = (
+        Index('ix_proof_daily_detail_proof', 'proofId', 'date'),
+    )
+
     @property
     def total_dpo_count(self) -> int:
         return self.dr_dpo_count + self.lh_dpo_count
@@ -633,13 +768,19 @@ class Invoice(Base):
     total_with_vat: Mapped[Optional[Decimal]] = mapped_column("totalWithVat", Numeric(12, 2))
     status: Mapped[str] = mapped_column(String(50), default="pending")
     file_url: Mapped[Optional[str]] = mapped_column("fileUrl", Text)
-    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, default=datetime.utcnow)
-    updated_at: Mapped[datetime] = mapped_column("updatedAt", DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, server_default=UTC_NOW)
+    updated_at: Mapped[datetime] = mapped_column("updatedAt", DateTime, server_default=UTC_NOW, onupdate=datetime.utcnow)
 
     # Relationships
-    carrier: Mapped["Carrier"] = relationship(back_populates="invoices")
+    carrier: Mapped["Carrier"] = relationship(back_populates="invoices", lazy="joined", innerjoin=True)
     proof: Mapped[Optional["Proof"]] = relationship(back_populates="invoices")
-    items: Mapped[List["InvoiceItem"]] = relationship(back_populates="invoice", cascade="all, delete-orphan")
+    items: Mapped[List["InvoiceItem"]] = relationship(back_populates="invoice", cascade="all, delete-orphan", lazy="selectin")
+
+    __table_args__ = (
+        Index('ix_invoice_carrier_period', 'carrierId', 'period', 'issueDate'),
+        UniqueConstraint('carrierId', 'invoiceNumber', name='uq_invoice_carrier_number'),
+        Index('ix_invoice_proof', 'proofId', postgresql_where=text('"proofId" IS NOT NULL')),
+    )
 
 
 class InvoiceItem(Base):
@@ -654,6 +795,10 @@ class InvoiceItem(Base):
 
     invoice: Mapped["Invoice"] = relationship(back_populates="items")
 
+    __table_args__ = (
+        Index('ix_invoice_item_invoice', 'invoiceId', postgresql_include=['amount']),
+    )
+
 
 # =============================================================================
 # PROOF ANALYSIS MODEL
@@ -665,18 +810,23 @@ class ProofAnalysis(Base):
     id: Mapped[int] = mapped_column(primary_key=True)
     proof_id: Mapped[int] = mapped_column("proofId", ForeignKey("Proof.id", ondelete="CASCADE"))
     status: Mapped[str] = mapped_column(String(50))
-    errors_json: Mapped[Optional[str]] = mapped_column("errorsJson", Text)
-    warnings_json: Mapped[Optional[str]] = mapped_column("warningsJson", Text)
-    ok_json: Mapped[Optional[str]] = mapped_column("okJson", Text)
+    errors_json: Mapped[Optional[Any]] = mapped_column("errorsJson", JSONB)
+    warnings_json: Mapped[Optional[Any]] = mapped_column("warningsJson", JSONB)
+    ok_json: Mapped[Optional[Any]] = mapped_column("okJson", JSONB)
     diff_fix: Mapped[Optional[Decimal]] = mapped_column("diffFix", Numeric(12, 2))
     diff_km: Mapped[Optional[Decimal]] = mapped_column("diffKm", Numeric(12, 2))
     diff_linehaul: Mapped[Optional[Decimal]] = mapped_column("diffLinehaul", Numeric(12, 2))
     diff_depo: Mapped[Optional[Decimal]] = mapped_column("diffDepo", Numeric(12, 2))
-    missing_rates_json: Mapped[Optional[str]] = mapped_column("missingRatesJson", Text)
-    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, default=datetime.utcnow)
+    missing_rates_json: Mapped[Optional[Any]] = mapped_column("missingRatesJson", JSONB)
+    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, server_default=UTC_NOW)
 
     proof: Mapped["Proof"] = relationship(back_populates="analyses")
 
+    __table_args__ = (
+        Index('ix_proof_analysis_proof', 'proofId'),
+        Index('ix_proof_analysis_errors_gin', 'errorsJson', postgresql_using='gin'),
+    )
+
 
 # =============================================================================
 # AUDIT LOG MODEL
@@ -689,10 +839,16 @@ class AuditLog(Base):
     entity_type: Mapped[str] = mapped_column("entityType", String(50))
     entity_id: Mapped[int] = mapped_column("entityId", Integer)
     action: Mapped[str] = mapped_column(String(50))
-    old_values: Mapped[Optional[str]] = mapped_column("oldValues", Text)
-    new_values: Mapped[Optional[str]] = mapped_column("newValues", Text)
+    old_values: Mapped[Optional[Any]] = mapped_column("oldValues", JSONB)
+    new_values: Mapped[Optional[Any]] = mapped_column("newValues", JSONB)
     user_email: Mapped[Optional[str]] = mapped_column("userEmail", String(255))
-    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, server_default=UTC_NOW)
+
+    __table_args__ = (
+        # Append-only tabulka řazená podle času - BRIN je proti B-tree zlomek velikosti
+        Index('ix_audit_log_created_brin', 'createdAt', postgresql_using='brin', postgresql_with={'pages_per_range': 32}),
+        Index('ix_audit_log_entity', 'entityType', 'entityId', 'createdAt'),
+    )
 
 
 # =============================================================================
@@ -704,7 +860,7 @@ class LoginLog(Base):
 
     id: Mapped[int] = mapped_column(primary_key=True)
     email: Mapped[Optional[str]] = mapped_column(String(255))
-    login_at: Mapped[datetime] = mapped_column("loginAt", DateTime, default=datetime.utcnow)
+    login_at: Mapped[datetime] = mapped_column("loginAt", DateTime, server_default=UTC_NOW)
     ip_address: Mapped[Optional[str]] = mapped_column("ipAddress", String(50))
     user_agent: Mapped[Optional[str]] = mapped_column("userAgent", Text)
 
@@ -722,13 +878,14 @@ class RoutePlan(Base):
     valid_from: Mapped[Optional[datetime]] = mapped_column("validFrom", DateTime)
     valid_to: Mapped[Optional[datetime]] = mapped_column("validTo", DateTime)
     file_name: Mapped[Optional[str]] = mapped_column("fileName", String(255))
-    file_url: Mapped[Optional[str]] = mapped_column("fileUrl", Text)
+    # Text sloupce, které žádná odpověď nečte - načítají se až při přístupu
+    file_url: Mapped[Optional[str]] = mapped_column("fileUrl", Text, deferred=True)
     plan_type: Mapped[Optional[str]] = mapped_column("planType", String(50))
     total_routes: Mapped[int] = mapped_column("totalRoutes", Integer, default=0)
     total_stops: Mapped[int] = mapped_column("totalStops", Integer, default=0)
     total_distance_km: Mapped[Optional[Decimal]] = mapped_column("totalDistanceKm", Numeric(10, 2))
     status: Mapped[str] = mapped_column(String(50), default="pending")
-    notes: Mapped[Optional[str]] = mapped_column(Text)
+    notes: Mapped[Optional[str]] = mapped_column(Text, deferred=True)
     # Additional aggregation columns
     dpo_routes_count: Mapped[int] = mapped_column("dpoRoutesCount", Integer, default=0)
     sd_routes_count: Mapped[int] = mapped_column("sdRoutesCount", Integer, default=0)
@@ -746,11 +903,11 @@ class RoutePlan(Base):
     bydzov_sd_count: Mapped[int] = mapped_column("bydzovSdCount", Integer, default=0)
     bydzov_km: Mapped[Optional[Decimal]] = mapped_column("bydzovKm", Numeric(10, 2), default=0)
     bydzov_duration_min: Mapped[int] = mapped_column("bydzovDurationMin", Integer, default=0)
-    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, default=datetime.utcnow)
-    updated_at: Mapped[datetime] = mapped_column("updatedAt", DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, server_default=UTC_NOW)
+    updated_at: Mapped[datetime] = mapped_column("updatedAt", DateTime, server_default=UTC_NOW, onupdate=datetime.utcnow)
 
     carrier: Mapped["Carrier"] = relationship(back_populates="route_plans")
-    routes: Mapped[List["RoutePlanRoute"]] = relationship(back_populates="route_plan", cascade="all, delete-orphan")
+    routes: Mapped[List["RoutePlanRoute"]] = relationship(back_populates="route_plan", cascade="all, delete-orphan", lazy=DEFAULT_LAZY)
 
 
 class RoutePlanRoute(Base):
@@ -763,10 +920,10 @@ class RoutePlanRoute(Base):
     stops_count: Mapped[int] = mapped_column("stopsCount", Integer, default=0)
     start_location: Mapped[Optional[str]] = mapped_column("startLocation", String(200))
     max_capacity: Mapped[Optional[Decimal]] = mapped_column("maxCapacity", Numeric(10, 2))
-    start_time: Mapped[Optional[str]] = mapped_column("startTime", String(10))
-    end_time: Mapped[Optional[str]] = mapped_column("endTime", String(10))
+    start_time: Mapped[Optional[time]] = mapped_column("startTime", Time)
+    end_time: Mapped[Optional[time]] = mapped_column("endTime", Time)
     total_distance_km: Mapped[Optional[Decimal]] = mapped_column("totalDistanceKm", Numeric(10, 3))
-    work_time: Mapped[Optional[str]] = mapped_column("workTime", String(10))
+    work_time: Mapped[Optional[timedelta]] = mapped_column("workTime", Interval)
     dr_lh: Mapped[Optional[str]] = mapped_column("drLh", String(20))
     depot: Mapped[Optional[str]] = mapped_column("depot", String(50))
     plan_type: Mapped[Optional[str]] = mapped_column("planType", String(10))
@@ -776,12 +933,19 @@ class RoutePlanRoute(Base):
     # NEW: Vazby na Route a Depot
     route_id: Mapped[Optional[int]] = mapped_column("routeId", ForeignKey("Route.id", ondelete="SET NULL"))
     depot_id: Mapped[Optional[int]] = mapped_column("depotId", ForeignKey("Depot.id", ondelete="SET NULL"))
-    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, server_default=UTC_NOW)
 
     route_plan: Mapped["RoutePlan"] = relationship(back_populates="routes")
-    details: Mapped[List["RoutePlanDetail"]] = relationship(back_populates="route", cascade="all, delete-orphan")
-    route_ref: Mapped[Optional["Route"]] = relationship(back_populates="route_plan_routes")
-    depot_ref: Mapped[Optional["Depot"]] = relationship(back_populates="route_plan_routes")
+    details: Mapped[List["RoutePlanDetail"]] = relationship(back_populates="route", cascade="all, delete-orphan", lazy=DEFAULT_LAZY)
+    route_ref: Mapped[Optional["Route"]] = relationship(back_populates="route_plan_routes", lazy=DEFAULT_LAZY)
+    depot_ref: Mapped[Optional["Depot"]] = relationship(back_populates="route_plan_routes", lazy=DEFAULT_LAZY)
+
+    __table_args__ = (
+        Index('ix_route_plan_route_plan', 'routePlanId'),
+        Index('ix_route_plan_route_route', 'routeId', postgresql_where=text('"routeId" IS NOT NULL')),
+        Index('ix_route_plan_route_depot', 'depotId', postgresql_where=text('"depotId" IS NOT NULL')),
+        Index('ix_route_plan_route_start', 'depot', 'startTime'),
+    )
 
 
 class RoutePlanDetail(Base):
@@ -790,16 +954,20 @@ class RoutePlanDetail(Base):
     id: Mapped[int] = mapped_column(primary_key=True)
     route_id: Mapped[int] = mapped_column("routeId", ForeignKey("RoutePlanRoute.id", ondelete="CASCADE"))
     sequence: Mapped[int] = mapped_column(Integer)
-    eta: Mapped[Optional[str]] = mapped_column(String(10))
+    eta: Mapped[Optional[time]] = mapped_column(Time)
     order_id: Mapped[Optional[str]] = mapped_column("orderId", String(50))
     stop_name: Mapped[Optional[str]] = mapped_column("stopName", String(255))
     address: Mapped[Optional[str]] = mapped_column(Text)
     distance_from_previous: Mapped[Optional[Decimal]] = mapped_column("distanceFromPrevious", Numeric(10, 2))
     unload_sequence: Mapped[Optional[int]] = mapped_column("unloadSequence", Integer)
-    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, server_default=UTC_NOW)
 
     route: Mapped["RoutePlanRoute"] = relationship(back_populates="details")
 
+    __table_args__ = (
+        Index('ix_route_plan_detail_route', 'routeId', 'sequence'),
+    )
+
 
 # =============================================================================
 # ALZABOX MODELS
@@ -821,11 +989,11 @@ class AlzaBox(Base):
     first_launch: Mapped[Optional[datetime]] = mapped_column("firstLaunch", DateTime)
     source_warehouse: Mapped[Optional[str]] = mapped_column("sourceWarehouse", String(20))
     is_active: Mapped[bool] = mapped_column("isActive", Boolean, default=True)
-    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, default=datetime.utcnow)
-    updated_at: Mapped[datetime] = mapped_column("updatedAt", DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, server_default=UTC_NOW)
+    updated_at: Mapped[datetime] = mapped_column("updatedAt", DateTime, server_default=UTC_NOW, onupdate=datetime.utcnow)
 
-    assignments: Mapped[List["AlzaBoxAssignment"]] = relationship(back_populates="box", cascade="all, delete-orphan")
-    deliveries: Mapped[List["AlzaBoxDelivery"]] = relationship(back_populates="box", cascade="all, delete-orphan")
+    assignments: Mapped[List["AlzaBoxAssignment"]] = relationship(back_populates="box", cascade="all, delete-orphan", lazy=DEFAULT_LAZY)
+    deliveries: Mapped[List["AlzaBoxDelivery"]] = relationship(back_populates="box", cascade="all, delete-orphan", lazy=DEFAULT_LAZY)
 
     __table_args__ = (
         Index('ix_alzabox_country_region', 'country', 'region'),
@@ -842,15 +1010,15 @@ class AlzaBoxAssignment(Base):
     route_group: Mapped[Optional[str]] = mapped_column("routeGroup", String(100))
     depot_name: Mapped[Optional[str]] = mapped_column("depotName", String(100))
     planned_delivery_time: Mapped[Optional[str]] = mapped_column("plannedDeliveryTime", String(10))
-    valid_from: Mapped[datetime] = mapped_column("validFrom", DateTime, default=datetime.utcnow)
+    valid_from: Mapped[datetime] = mapped_column("validFrom", DateTime, server_default=UTC_NOW)
     valid_to: Mapped[Optional[datetime]] = mapped_column("validTo", DateTime, nullable=True)
     # NEW: Vazba na Route
     route_id: Mapped[Optional[int]] = mapped_column("routeId", ForeignKey("Route.id", ondelete="SET NULL"))
-    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, server_default=UTC_NOW)
 
     box: Mapped["AlzaBox"] = relationship(back_populates="assignments")
     carrier: Mapped[Optional["Carrier"]] = relationship()
-    route: Mapped[Optional["Route"]] = relationship(back_populates="box_assignments")
+    route: Mapped[Optional["Route"]] = relationship(back_populates="box_assignments", lazy=DEFAULT_LAZY)
 
     __table_args__ = (
         Index('ix_assignment_route', 'routeName', 'validFrom'),
@@ -862,8 +1030,9 @@ class AlzaBoxDelivery(Base):
     __tablename__ = "AlzaBoxDelivery"
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    box_id: Mapped[int] = mapped_column("boxId", ForeignKey("AlzaBox.id", ondelete="CASCADE"), index=True)
-    delivery_date: Mapped[datetime] = mapped_column("deliveryDate", DateTime, index=True)
+    # boxId a deliveryDate bez vlastních indexů - pokrývá je uq_box_date_type a ix_delivery_date_route
+    box_id: Mapped[int] = mapped_column("boxId", ForeignKey("AlzaBox.id", ondelete="CASCADE"))
+    delivery_date: Mapped[datetime] = mapped_column("deliveryDate", DateTime)
     delivery_type: Mapped[str] = mapped_column("deliveryType", String(10))
     route_name: Mapped[Optional[str]] = mapped_column("routeName", String(100))
     carrier_id: Mapped[Optional[int]] = mapped_column("carrierId", ForeignKey("Carrier.id", ondelete="SET NULL"))
@@ -871,7 +1040,7 @@ class AlzaBoxDelivery(Base):
     actual_time: Mapped[Optional[datetime]] = mapped_column("actualTime", DateTime)
     delay_minutes: Mapped[Optional[int]] = mapped_column("delayMinutes", Integer)
     on_time: Mapped[Optional[bool]] = mapped_column("onTime", Boolean)
-    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, server_default=UTC_NOW)
 
     box: Mapped["AlzaBox"] = relationship(back_populates="deliveries")
     carrier: Mapped[Optional["Carrier"]] = relationship()
@@ -879,7 +1048,8 @@ class AlzaBoxDelivery(Base):
     __table_args__ = (
         UniqueConstraint('boxId', 'deliveryDate', 'deliveryType', name='uq_box_date_type'),
         Index('ix_delivery_date_route', 'deliveryDate', 'routeName'),
-        Index('ix_delivery_carrier_date', 'carrierId', 'deliveryDate'),
+        # Statistiky dopravce za období (onTime/delayMinutes) jako index-only scan
+        Index('ix_delivery_carrier_date_ontime', 'carrierId', 'deliveryDate', postgresql_include=['onTime', 'delayMinutes']),
     )
 
 
@@ -899,9 +1069,56 @@ class DeliveryStats(Base):
     avg_delay_minutes: Mapped[Optional[Decimal]] = mapped_column("avgDelayMinutes", Numeric(8, 2))
     max_delay_minutes: Mapped[Optional[int]] = mapped_column("maxDelayMinutes", Integer)
     on_time_pct: Mapped[Optional[Decimal]] = mapped_column("onTimePct", Numeric(5, 2))
-    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column("createdAt", DateTime, server_default=UTC_NOW)
 
     __table_args__ = (
         UniqueConstraint('statsDate', 'deliveryType', 'routeName', 'carrierId', name='uq_stats_day'),
         Index('ix_stats_carrier_date', 'carrierId', 'statsDate'),
     )
+
+
+# =============================================================================
+# SCHEMA VERSION MODEL
+# =============================================================================
+
+class SchemaVersion(Base):
+    """Verze DB schématu - run_migrations se při aktuální verzi přeskočí"""
+    __tablename__ = "SchemaVersion"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, nullable=False)
+
+
+# =============================================================================
+# PŘEDPŘIPRAVENÉ DOTAZY
+# =============================================================================
+
+# Aktuální depo/dopravce trasy k datu (Route.current_depot / current_carrier) -
+# sestaveno jednou, při volání se jen dosadí route_id a as_of
+_CURRENT_DEPOT_STMT = (
+    select(Depot)
+    .join(RouteDepotHistory, RouteDepotHistory.depot_id == Depot.id)
+    .where(
+        RouteDepotHistory.route_id == bindparam("route_id"),
+        RouteDepotHistory.valid_from <= bindparam("as_of"),
+        or_(RouteDepotHistory.valid_to.is_(None), RouteDepotHistory.valid_to > bindparam("as_of")),
+    )
+    .order_by(RouteDepotHistory.valid_from.desc())
+    .limit(1)
+)
+
+_CURRENT_CARRIER_STMT = (
+    select(Carrier)
+    .join(RouteCarrierHistory, RouteCarrierHistory.carrier_id == Carrier.id)
+    .where(
+        RouteCarrierHistory.route_id == bindparam("route_id"),
+        RouteCarrierHistory.valid_from <= bindparam("as_of"),
+        or_(RouteCarrierHistory.valid_to.is_(None), RouteCarrierHistory.valid_to > bindparam("as_of")),
+    )
+    .order_by(RouteCarrierHistory.valid_from.desc())
+    .limit(1)
+)
+
+
+# Vyřeš všechny relationship("...") řetězce hned při importu, ne až při prvním dotazu
+configure_mappers()
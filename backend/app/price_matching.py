@@ -1,10 +1,10 @@
 """
 Price Matching - Helper funkce pro párování plánů s ceníky
 """
-import re
 from decimal import Decimal
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass
+from functools import lru_cache
 
 
 # =============================================================================
@@ -77,6 +77,11 @@ ROUTE_PREFIX_TO_DEPOT = {
     'Praha_STČ': 'DIRECT',
 }
 
+# Prefixy předem převedené na velká písmena - pořadí (= priorita) zůstává
+_ROUTE_PREFIX_UPPER = tuple(
+    (prefix.upper(), depot_code) for prefix, depot_code in ROUTE_PREFIX_TO_DEPOT.items()
+)
+
 DR_LH_TRIP_COUNT = {
     'DR': 1,
     'DR-DR': 2,
@@ -154,17 +159,20 @@ def get_fix_rate_key(start_location: str) -> Optional[str]:
     return None
 
 
+@lru_cache(maxsize=512)
 def detect_depot_from_route_name(route_name: str) -> Optional[str]:
     """
     Detekuje depo z názvu trasy.
     
     Např. "Moravskoslezsko A" -> "VRATIMOV"
          "Liberecko F + Ústecko L" -> "NOVY_BYDZOV"
+    
+    Výsledek je cachovaný - názvy tras se opakují v každém plánu dopravce.
     """
     route_upper = route_name.upper()
     
-    for prefix, depot_code in ROUTE_PREFIX_TO_DEPOT.items():
-        if prefix.upper() in route_upper:
+    for prefix_upper, depot_code in _ROUTE_PREFIX_UPPER:
+        if prefix_upper in route_upper:
             return depot_code
     
     return None
@@ -188,8 +196,8 @@ def count_trips(dr_lh: str) -> int:
         return DR_LH_TRIP_COUNT[dr_lh_clean]
     
     # Počítáme DR a LH
-    dr_count = len(re.findall(r'DR', dr_lh_clean))
-    lh_count = len(re.findall(r'LH', dr_lh_clean))
+    dr_count = dr_lh_clean.count('DR')
+    lh_count = dr_lh_clean.count('LH')
     
     return max(dr_count, lh_count, 1)
 
@@ -205,7 +213,7 @@ def count_linehauls(dr_lh: str) -> int:
     """Spočítá počet linehaulů."""
     if not dr_lh:
         return 0
-    return len(re.findall(r'LH', dr_lh.upper()))
+    return dr_lh.upper().count('LH')
 
 
 # =============================================================================
@@ -221,63 +229,127 @@ def calculate_route_cost(
     """
     Vypočítá plánované náklady pro trasu.
     """
+    return calculate_route_cost_indexed(
+        route,
+        _index_fix_rates(fix_rates),
+        _index_km_rates(km_rates),
+        _index_linehaul_rates(linehaul_rates),
+    )
+
+
+def calculate_route_cost_indexed(
+    route: RouteInfo,
+    fix_idx: Dict[str, Any],
+    km_idx: Dict[str, Any],
+    lh_idx: Dict[str, Any],
+    cache: Optional[Dict[Tuple, Tuple]] = None,
+) -> CostBreakdown:
+    """
+    Vypočítá plánované náklady pro trasu nad předem zaindexovanými ceníky
+    (viz _index_*_rates) - vyhledání sazby je lookup ve slovníku.
+    
+    cache: slovník pro memoizaci sazeb nezávislých na vzdálenosti, klíč
+    (start_location, dr_lh, depot_code). Platí jen pro jedny indexy ceníků.
+    """
+    depot_code = detect_depot_from_route_name(route.route_name)
+    key = (route.start_location, route.dr_lh, depot_code)
+    
+    bundle = cache.get(key) if cache is not None else None
+    if bundle is None:
+        bundle = _compute_rate_bundle(
+            route.start_location, route.dr_lh, depot_code, fix_idx, km_idx, lh_idx
+        )
+        if cache is not None:
+            cache[key] = bundle
+    
+    fix_cost, km_rate, linehaul_cost, trips, route_category, warnings, missing_rates = bundle
+    
+    # Jediná složka závislá na vzdálenosti
+    km_cost = km_rate * route.total_distance_km * trips
+    total_cost = fix_cost + km_cost + linehaul_cost
+    
+    return CostBreakdown(
+        fix_cost=fix_cost,
+        km_cost=km_cost,
+        linehaul_cost=linehaul_cost,
+        total_cost=total_cost,
+        trips_count=trips,
+        route_category=route_category,
+        depot_code=depot_code,
+        warnings=list(warnings),
+        missing_rates=list(missing_rates),
+    )
+
+
+def _compute_rate_bundle(
+    start_location: str,
+    dr_lh: str,
+    depot_code: Optional[str],
+    fix_idx: Dict[str, Any],
+    km_idx: Dict[str, Any],
+    lh_idx: Dict[str, Any],
+) -> Tuple:
+    """
+    Části výpočtu nezávislé na vzdálenosti trasy.
+    
+    Returns:
+        (fix_cost, km_rate, linehaul_cost, trips, route_category, warnings, missing_rates)
+    """
     warnings = []
     missing_rates = []
     
     # 1. Určit kategorii trasy
-    route_category = get_route_category(route.start_location)
-    depot_code = detect_depot_from_route_name(route.route_name)
+    route_category = get_route_category(start_location)
     
     if route_category == 'UNKNOWN':
-        warnings.append(f"Neznámé startovní místo: {route.start_location}")
+        warnings.append(f"Neznámé startovní místo: {start_location}")
         route_category = 'DIRECT_DEPO'
     
     # 2. Počet jízd
-    trips = count_trips(route.dr_lh)
+    trips = count_trips(dr_lh)
     
-    # 3. FIX sazba
-    fix_rate_key = get_fix_rate_key(route.start_location)
-    fix_rate = find_fix_rate(fix_rates, fix_rate_key, depot_code)
+    # 3. FIX sazba - priorita route_type, depot_code, DIRECT default (jako find_fix_rate)
+    fix_rate_key = get_fix_rate_key(start_location)
+    fix_rate = fix_idx['by_type'].get(fix_rate_key) if fix_rate_key else None
+    if fix_rate is None and depot_code:
+        fix_rate = fix_idx['by_depot'].get(depot_code)
+    if fix_rate is None:
+        fix_rate = fix_idx['default_direct']
     
     if fix_rate is None:
-        missing_rates.append(f"FIX sazba pro {fix_rate_key or route.start_location}")
+        missing_rates.append(f"FIX sazba pro {fix_rate_key or start_location}")
         fix_rate = Decimal('0')
     
     fix_cost = fix_rate * trips
     
-    # 4. KM sazba
-    km_rate = find_km_rate(km_rates, depot_code)
+    # 4. KM sazba - podle depot_code, jinak první dostupná (jako find_km_rate)
+    km_rate = km_idx['by_depot'].get(depot_code) if depot_code else None
+    if km_rate is None:
+        km_rate = km_idx['fallback']
     
     if km_rate is None:
         missing_rates.append(f"KM sazba pro {depot_code or 'default'}")
         km_rate = Decimal('0')
     
-    km_cost = km_rate * route.total_distance_km * trips
-    
     # 5. Linehaul
     linehaul_cost = Decimal('0')
     
-    if route_category == 'DIRECT_DEPO' and has_linehaul(route.dr_lh):
-        linehaul_count = count_linehauls(route.dr_lh)
-        lh_rate = find_linehaul_rate(linehaul_rates, depot_code)
+    if route_category == 'DIRECT_DEPO' and has_linehaul(dr_lh):
+        linehaul_count = count_linehauls(dr_lh)
+        lh_rate = None
+        if depot_code:
+            lh_rate = lh_idx['exact'].get((depot_code, 'KAMION'))
+            if lh_rate is None:
+                lh_rate = lh_idx['by_to'].get(depot_code)
         
         if lh_rate is None:
             missing_rates.append(f"Linehaul sazba pro {depot_code}")
         else:
             linehaul_cost = lh_rate * linehaul_count
     
-    total_cost = fix_cost + km_cost + linehaul_cost
-    
-    return CostBreakdown(
-        fix_cost=fix_cost,
-        km_cost=km_cost,
-        linehaul_cost=linehaul_cost,
-        total_cost=total_cost,
-        trips_count=trips,
-        route_category=route_category,
-        depot_code=depot_code,
-        warnings=warnings,
-        missing_rates=missing_rates,
+    return (
+        fix_cost, km_rate, linehaul_cost, trips, route_category,
+        tuple(warnings), tuple(missing_rates),
     )
 
 
@@ -295,20 +367,20 @@ def find_fix_rate(
         for rate in fix_rates:
             rt = rate.get('route_type') or rate.get('routeType')
             if rt == route_type:
-                return Decimal(str(rate['rate']))
+                return _to_decimal(rate['rate'])
     
     # Priorita 2: Podle depot_code
     if depot_code:
         for rate in fix_rates:
             dc = rate.get('depot_code') or rate.get('depotCode')
             if dc == depot_code:
-                return Decimal(str(rate['rate']))
+                return _to_decimal(rate['rate'])
     
     # Priorita 3: DIRECT jako default
     for rate in fix_rates:
         rt = rate.get('route_type') or rate.get('routeType') or ''
         if 'DIRECT' in rt:
-            return Decimal(str(rate['rate']))
+            return _to_decimal(rate['rate'])
     
     return None
 
@@ -326,11 +398,11 @@ def find_km_rate(
         for rate in km_rates:
             dc = rate.get('depot_code') or rate.get('depotCode')
             if dc == depot_code:
-                return Decimal(str(rate['rate']))
+                return _to_decimal(rate['rate'])
     
     # Priorita 2: První dostupná
     if km_rates:
-        return Decimal(str(km_rates[0]['rate']))
+        return _to_decimal(km_rates[0]['rate'])
     
     return None
 
@@ -350,18 +422,80 @@ def find_linehaul_rate(
             tc = rate.get('to_code') or rate.get('toCode')
             vt = rate.get('vehicle_type') or rate.get('vehicleType')
             if tc == to_depot_code and vt == vehicle_type:
-                return Decimal(str(rate['rate']))
+                return _to_decimal(rate['rate'])
     
     # Priorita 2: Shoda to_code
     if to_depot_code:
         for rate in linehaul_rates:
             tc = rate.get('to_code') or rate.get('toCode')
             if tc == to_depot_code:
-                return Decimal(str(rate['rate']))
+                return _to_decimal(rate['rate'])
     
     return None
 
 
+# =============================================================================
+# INDEXY SAZEB
+# =============================================================================
+# Ceníky se zaindexují jednou na plán - camelCase/snake_case varianty klíčů
+# i převod na Decimal proběhnou jednou na sazbu, ne jednou na trasu.
+# Při více sazbách se stejným klíčem vyhrává první (stejně jako find_*_rate).
+
+def _to_decimal(value: Any) -> Decimal:
+    """Sazba z DB už bývá Decimal - převod přes str jen pro float/int/str z JSONu."""
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+def _index_fix_rates(fix_rates: List[Dict]) -> Dict[str, Any]:
+    """FIX sazby podle route_type a depot_code + první DIRECT sazba jako default."""
+    by_type = {}
+    by_depot = {}
+    default_direct = None
+    
+    for rate in fix_rates or ():
+        rt = rate.get('route_type') or rate.get('routeType')
+        dc = rate.get('depot_code') or rate.get('depotCode')
+        if rt and rt not in by_type:
+            by_type[rt] = _to_decimal(rate['rate'])
+        if dc and dc not in by_depot:
+            by_depot[dc] = _to_decimal(rate['rate'])
+        if default_direct is None and rt and 'DIRECT' in rt:
+            default_direct = _to_decimal(rate['rate'])
+    
+    return {'by_type': by_type, 'by_depot': by_depot, 'default_direct': default_direct}
+
+
+def _index_km_rates(km_rates: List[Dict]) -> Dict[str, Any]:
+    """KM sazby podle depot_code + první sazba jako fallback."""
+    by_depot = {}
+    
+    for rate in km_rates or ():
+        dc = rate.get('depot_code') or rate.get('depotCode')
+        if dc and dc not in by_depot:
+            by_depot[dc] = _to_decimal(rate['rate'])
+    
+    fallback = _to_decimal(km_rates[0]['rate']) if km_rates else None
+    return {'by_depot': by_depot, 'fallback': fallback}
+
+
+def _index_linehaul_rates(linehaul_rates: List[Dict]) -> Dict[str, Any]:
+    """Linehaul sazby podle (to_code, vehicle_type) a samotného to_code."""
+    exact = {}
+    by_to = {}
+    
+    for rate in linehaul_rates or ():
+        tc = rate.get('to_code') or rate.get('toCode')
+        vt = rate.get('vehicle_type') or rate.get('vehicleType')
+        if not tc:
+            continue
+        if (tc, vt) not in exact:
+            exact[(tc, vt)] = _to_decimal(rate['rate'])
+        if tc not in by_to:
+            by_to[tc] = _to_decimal(rate['rate'])
+    
+    return {'exact': exact, 'by_to': by_to}
+
+
 # =============================================================================
 # AGREGAČNÍ FUNKCE
 # =============================================================================
@@ -375,57 +509,72 @@ def calculate_plan_total_cost(
     """
     Vypočítá celkové náklady za plánovací soubor.
     """
-    total_fix = Decimal('0')
-    total_km = Decimal('0')
-    total_linehaul = Decimal('0')
-    total = Decimal('0')
+    # Výstup je ve floatech - sčítá se rovnou ve floatech, Decimal zůstává
+    # jen pro přesný výpočet nákladů jednotlivé trasy
+    total_fix = 0.0
+    total_km = 0.0
+    total_linehaul = 0.0
+    total = 0.0
     
     all_warnings = []
     all_missing_rates = set()
     
     per_depot = {}
     
+    fix_idx = _index_fix_rates(fix_rates)
+    km_idx = _index_km_rates(km_rates)
+    lh_idx = _index_linehaul_rates(linehaul_rates)
+    # Trasy plánu se často liší jen vzdáleností - sazby se počítají jednou
+    # na kombinaci (start_location, dr_lh, depot_code)
+    rate_cache = {}
+    
     for route in routes:
-        cost = calculate_route_cost(route, fix_rates, km_rates, linehaul_rates)
+        cost = calculate_route_cost_indexed(route, fix_idx, km_idx, lh_idx, rate_cache)
+        
+        fix_cost = float(cost.fix_cost)
+        km_cost = float(cost.km_cost)
+        linehaul_cost = float(cost.linehaul_cost)
+        total_cost = float(cost.total_cost)
         
-        total_fix += cost.fix_cost
-        total_km += cost.km_cost
-        total_linehaul += cost.linehaul_cost
-        total += cost.total_cost
+        total_fix += fix_cost
+        total_km += km_cost
+        total_linehaul += linehaul_cost
+        total += total_cost
         
         all_warnings.extend(cost.warnings)
         all_missing_rates.update(cost.missing_rates)
         
         # Per depot agregace
         depot = cost.depot_code or 'UNKNOWN'
-        if depot not in per_depot:
-            per_depot[depot] = {
+        stats = per_depot.get(depot)
+        if stats is None:
+            stats = per_depot[depot] = {
                 'routes_count': 0,
                 'trips_count': 0,
-                'fix_cost': Decimal('0'),
-                'km_cost': Decimal('0'),
-                'linehaul_cost': Decimal('0'),
-                'total_cost': Decimal('0'),
-                'total_km': Decimal('0'),
+                'fix_cost': 0.0,
+                'km_cost': 0.0,
+                'linehaul_cost': 0.0,
+                'total_cost': 0.0,
+                'total_km': 0.0,
             }
         
-        per_depot[depot]['routes_count'] += 1
-        per_depot[depot]['trips_count'] += cost.trips_count
-        per_depot[depot]['fix_cost'] += cost.fix_cost
-        per_depot[depot]['km_cost'] += cost.km_cost
-        per_depot[depot]['linehaul_cost'] += cost.linehaul_cost
-        per_depot[depot]['total_cost'] += cost.total_cost
-        per_depot[depot]['total_km'] += route.total_distance_km
+        stats['routes_count'] += 1
+        stats['trips_count'] += cost.trips_count
+        stats['fix_cost'] += fix_cost
+        stats['km_cost'] += km_cost
+        stats['linehaul_cost'] += linehaul_cost
+        stats['total_cost'] += total_cost
+        stats['total_km'] += float(route.total_distance_km)
     
     return {
         'total': {
-            'fix_cost': float(total_fix),
-            'km_cost': float(total_km),
-            'linehaul_cost': float(total_linehaul),
-            'total_cost': float(total),
+            'fix_cost': total_fix,
+            'km_cost': total_km,
+            'linehaul_cost': total_linehaul,
+            'total_cost': total,
             'routes_count': len(routes),
         },
-        'per_depot': {k: {kk: float(vv) if isinstance(vv, Decimal) else vv for kk, vv in v.items()} for k, v in per_depot.items()},
+        'per_depot': per_depot,
         'warnings': all_warnings,
         'missing_rates': list(all_missing_rates),
     }
@@ -12,12 +12,31 @@ Updated: 2025-12-09 - Fixed MultipleResultsFound error by handling duplicate act
 """
 from datetime import datetime
 from typing import Dict, List, Optional, Any
-from sqlalchemy import select, and_
+from sqlalchemy import select, and_, bindparam
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models import Route, RouteDepotHistory, RouteCarrierHistory
 
 
+# Dotazy volané pro každou trasu plánu - sestaveny jednou při importu,
+# v cyklu se jen dosadí parametry (bez skládání výrazů a cache klíče)
+_ROUTE_BY_NAME_STMT = select(Route).where(Route.route_name == bindparam("route_name"))
+
+_ACTIVE_DEPOT_ASSIGNMENTS_STMT = select(RouteDepotHistory).where(
+    and_(
+        RouteDepotHistory.route_id == bindparam("route_id"),
+        RouteDepotHistory.valid_to.is_(None)
+    )
+).order_by(RouteDepotHistory.id.desc())
+
+_ACTIVE_CARRIER_ASSIGNMENTS_STMT = select(RouteCarrierHistory).where(
+    and_(
+        RouteCarrierHistory.route_id == bindparam("route_id"),
+        RouteCarrierHistory.valid_to.is_(None)
+    )
+).order_by(RouteCarrierHistory.id.desc())
+
+
 def extract_region_from_route_name(route_name: str) -> Optional[str]:
     """
     Extrahuje region z názvu trasy.
@@ -56,9 +75,7 @@ async def get_or_create_route(
         route_id: ID existující nebo nově vytvořené trasy
     """
     # Hledej existující Route
-    result = await db.execute(
-        select(Route).where(Route.route_name == route_name)
-    )
+    result = await db.execute(_ROUTE_BY_NAME_STMT, {"route_name": route_name})
     existing_route = result.scalar_one_or_none()
     
     if existing_route:
@@ -71,8 +88,6 @@ async def get_or_create_route(
         route_name=route_name,
         region=region,
         is_active=True,
-        created_at=datetime.utcnow(),
-        updated_at=datetime.utcnow()
     )
     db.add(new_route)
     await db.flush()
@@ -97,14 +112,7 @@ async def ensure_route_depot_assignment(
         True pokud bylo vytvořeno nové přiřazení, False pokud již existovalo
     """
     # Najdi aktuální aktivní přiřazení (může být více - vezmeme první)
-    result = await db.execute(
-        select(RouteDepotHistory).where(
-            and_(
-                RouteDepotHistory.route_id == route_id,
-                RouteDepotHistory.valid_to.is_(None)
-            )
-        ).order_by(RouteDepotHistory.id.desc())
-    )
+    result = await db.execute(_ACTIVE_DEPOT_ASSIGNMENTS_STMT, {"route_id": route_id})
     current_assignments = result.scalars().all()
     
     # Pokud jsou duplicity, ukončíme všechny kromě poslední
@@ -147,14 +155,7 @@ async def ensure_route_carrier_assignment(
         True pokud bylo vytvořeno nové přiřazení, False pokud již existovalo
     """
     # Najdi aktuální aktivní přiřazení (může být více - vezmeme první)
-    result = await db.execute(
-        select(RouteCarrierHistory).where(
-            and_(
-                RouteCarrierHistory.route_id == route_id,
-                RouteCarrierHistory.valid_to.is_(None)
-            )
-        ).order_by(RouteCarrierHistory.id.desc())
-    )
+    result = await db.execute(_ACTIVE_CARRIER_ASSIGNMENTS_STMT, {"route_id": route_id})
     current_assignments = result.scalars().all()
     
     # Pokud jsou duplicity, ukončíme všechny kromě poslední
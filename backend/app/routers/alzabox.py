@@ -126,8 +126,6 @@ async def import_alzabox_locations(
                     gps_lon=Decimal(str(gps_lon)) if gps_lon else None,
                     source_warehouse=source_warehouse,
                     first_launch=first_launch if isinstance(first_launch, datetime) else None,
-                    created_at=datetime.utcnow(),
-                    updated_at=datetime.utcnow()
                 )
                 db.add(box)
                 await db.flush()
@@ -143,8 +141,6 @@ async def import_alzabox_locations(
                     carrier_id=carrier_id,
                     route_group=str(route_group) if route_group else None,
                     depot_name=None,
-                    valid_from=datetime.utcnow(),
-                    created_at=datetime.utcnow()
                 )
                 db.add(assignment)
         
@@ -349,7 +345,6 @@ async def import_alzabox_deliveries(
                     actual_time=actual_time,
                     delay_minutes=delay_minutes,
                     on_time=on_time,
-                    created_at=datetime.utcnow()
                 )
                 db.add(delivery)
                 created += 1
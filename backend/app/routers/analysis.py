@@ -2,16 +2,19 @@
 Analysis API Router
 Updated: 2025-12-05 - Využívá depot_id, route_category pro párování
 """
-from typing import Optional
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional, Tuple
 from decimal import Decimal
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy import select, and_
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import joinedload, selectinload
 
 from app.database import get_db
 from app.models import (
-    Proof, Carrier, PriceConfig, FixRate, KmRate, DepoRate, LinehaulRate
+    Proof, Carrier, Depot, Invoice, PriceConfig, FixRate, KmRate, DepoRate, LinehaulRate,
+    with_loaded,
 )
 
 router = APIRouter()
@@ -97,6 +100,113 @@ def detect_depot_code_from_type(route_type: str) -> Optional[str]:
     return None
 
 
+# =============================================================================
+# CACHE MAP SAZEB
+# =============================================================================
+
+EMPTY_RATE_MAPS = {'fix': {}, 'km': None, 'depo': {}, 'linehaul': {}}
+
+# Mapy sazeb podle (price_config_id, updatedAt) - úprava ceníku mění updatedAt,
+# takže zastaralá položka se už netrefí a časem vypadne z LRU.
+# Kódy dep v cache nejsou (jen depot_id) - úprava depa updatedAt ceníku nemění,
+# proto se kódy dotahují čerstvě při každém volání get_rate_maps.
+_RATE_MAPS_CACHE: "OrderedDict[Tuple[int, datetime], dict]" = OrderedDict()
+_RATE_MAPS_CACHE_SIZE = 256
+
+
+def build_rate_maps(price_config: PriceConfig) -> dict:
+    """Sestaví slovníky sazeb z načteného ceníku (fix/depo/linehaul podle klíče, km sazba)"""
+    # FIX rates - klíč je route_type, ale ukládáme i category a depot
+    fix_rates_map = {}
+    for r in price_config.fix_rates:
+        fix_rates_map[r.route_type] = {
+            'rate': float(r.rate),
+            'route_category': r.route_category,
+            'depot_id': r.depot_id,
+        }
+    
+    # KM rate
+    km_rate_config = None
+    if price_config.km_rates:
+        km_rate_config = float(price_config.km_rates[0].rate)
+    
+    # Depo rates
+    depo_rates_map = {}
+    for r in price_config.depo_rates:
+        key = f"{r.depo_name}_{r.rate_type}"
+        depo_rates_map[key] = {
+            'rate': float(r.rate),
+            'depot_id': r.depot_id,
+        }
+    
+    # Linehaul rates
+    linehaul_rates_map = {}
+    for r in price_config.linehaul_rates:
+        key = f"{r.from_code or ''}_{r.to_code or ''}_{r.vehicle_type}"
+        linehaul_rates_map[key] = float(r.rate)
+    
+    return {
+        'fix': fix_rates_map,
+        'km': km_rate_config,
+        'depo': depo_rates_map,
+        'linehaul': linehaul_rates_map,
+        'depot_ids': frozenset(
+            info['depot_id']
+            for info in (*fix_rates_map.values(), *depo_rates_map.values())
+            if info['depot_id'] is not None
+        ),
+    }
+
+
+def with_depot_codes(rate_maps: dict, depot_codes: Dict[int, Optional[str]]) -> dict:
+    """Kopie map sazeb z cache s aktuálními kódy dep (cache zůstává beze změny)"""
+    def resolve(rates_map: dict) -> dict:
+        return {
+            key: {**info, 'depot_code': depot_codes.get(info['depot_id'])}
+            for key, info in rates_map.items()
+        }
+    
+    return {
+        'fix': resolve(rate_maps['fix']),
+        'km': rate_maps['km'],
+        'depo': resolve(rate_maps['depo']),
+        'linehaul': rate_maps['linehaul'],
+    }
+
+
+async def get_rate_maps(db: AsyncSession, price_config_id: int, updated_at: datetime) -> dict:
+    """Vrátí mapy sazeb ceníku - z cache, jinak jedním eager-loaded dotazem; kódy dep vždy aktuální"""
+    key = (price_config_id, updated_at)
+    rate_maps = _RATE_MAPS_CACHE.get(key)
+    if rate_maps is not None:
+        _RATE_MAPS_CACHE.move_to_end(key)
+    else:
+        result = await db.execute(
+            select(PriceConfig)
+            .options(
+                selectinload(PriceConfig.fix_rates),
+                selectinload(PriceConfig.km_rates),
+                selectinload(PriceConfig.depo_rates),
+                selectinload(PriceConfig.linehaul_rates),
+            )
+            .where(PriceConfig.id == price_config_id)
+        )
+        rate_maps = build_rate_maps(result.scalar_one())
+        
+        _RATE_MAPS_CACHE[key] = rate_maps
+        if len(_RATE_MAPS_CACHE) > _RATE_MAPS_CACHE_SIZE:
+            _RATE_MAPS_CACHE.popitem(last=False)
+    
+    depot_codes = {}
+    if rate_maps['depot_ids']:
+        result = await db.execute(
+            select(Depot.id, Depot.code).where(Depot.id.in_(rate_maps['depot_ids']))
+        )
+        depot_codes = dict(result.all())
+    
+    return with_depot_codes(rate_maps, depot_codes)
+
+
 # =============================================================================
 # HLAVNÍ ENDPOINT
 # =============================================================================
@@ -111,8 +221,6 @@ async def analyze_proof(proof_id: int, db: AsyncSession = Depends(get_db)):
     result = await db.execute(
         select(Proof)
         .options(
-            selectinload(Proof.carrier),
-            selectinload(Proof.depot),
             selectinload(Proof.route_details),
             selectinload(Proof.linehaul_details),
             selectinload(Proof.depo_details),
@@ -125,16 +233,9 @@ async def analyze_proof(proof_id: int, db: AsyncSession = Depends(get_db)):
     if not proof:
         raise HTTPException(status_code=404, detail="Proof not found")
     
-    # Načti aktivní ceník s relationships
-    price_config = None
+    # Najdi aktivní ceník - jen id a updatedAt, sazby bere get_rate_maps z cache
     price_result = await db.execute(
-        select(PriceConfig)
-        .options(
-            selectinload(PriceConfig.fix_rates).selectinload(FixRate.depot),
-            selectinload(PriceConfig.km_rates).selectinload(KmRate.depot),
-            selectinload(PriceConfig.depo_rates).selectinload(DepoRate.depot),
-            selectinload(PriceConfig.linehaul_rates),
-        )
+        select(PriceConfig.id, PriceConfig.updated_at)
         .where(
             and_(
                 PriceConfig.carrier_id == proof.carrier_id,
@@ -143,40 +244,20 @@ async def analyze_proof(proof_id: int, db: AsyncSession = Depends(get_db)):
             )
         )
         .order_by(PriceConfig.valid_from.desc())
+        .limit(1)
     )
-    price_config = price_result.scalars().first()
+    price_config = price_result.first()
     
     # Připrav mapy sazeb
-    fix_rates_map = {}
-    km_rate_config = None
-    depo_rates_map = {}
-    linehaul_rates_map = {}
-    
     if price_config:
-        # FIX rates - klíč je route_type, ale ukládáme i category a depot
-        for r in price_config.fix_rates:
-            fix_rates_map[r.route_type] = {
-                'rate': float(r.rate),
-                'route_category': r.route_category,
-                'depot_code': r.depot.code if r.depot else None,
-            }
-        
-        # KM rate
-        if price_config.km_rates:
-            km_rate_config = float(price_config.km_rates[0].rate)
-        
-        # Depo rates
-        for r in price_config.depo_rates:
-            key = f"{r.depo_name}_{r.rate_type}"
-            depo_rates_map[key] = {
-                'rate': float(r.rate),
-                'depot_code': r.depot.code if r.depot else None,
-            }
-        
-        # Linehaul rates
-        for r in price_config.linehaul_rates:
-            key = f"{r.from_code or ''}_{r.to_code or ''}_{r.vehicle_type}"
-            linehaul_rates_map[key] = float(r.rate)
+        rate_maps = await get_rate_maps(db, price_config.id, price_config.updated_at)
+    else:
+        rate_maps = EMPTY_RATE_MAPS
+    
+    fix_rates_map = rate_maps['fix']
+    km_rate_config = rate_maps['km']
+    depo_rates_map = rate_maps['depo']
+    linehaul_rates_map = rate_maps['linehaul']
     
     # === ANALÝZA ROUTE DETAILS ===
     route_details = []
@@ -422,10 +503,10 @@ async def get_analysis_summary(
     db: AsyncSession = Depends(get_db)
 ):
     """Get summary of all proofs analysis"""
-    query = select(Proof).options(
-        selectinload(Proof.carrier),
-        selectinload(Proof.invoices),
-    )
+    query = select(Proof).options(*with_loaded(
+        joinedload(Proof.carrier),
+        selectinload(Proof.invoices).selectinload(Invoice.items),
+    ))
     
     filters = []
     if carrier_id:
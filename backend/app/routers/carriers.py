@@ -112,7 +112,16 @@ async def update_carrier(
 @router.delete("/{carrier_id}", status_code=204)
 async def delete_carrier(carrier_id: int, db: AsyncSession = Depends(get_db)):
     """Delete carrier"""
-    result = await db.execute(select(Carrier).where(Carrier.id == carrier_id))
+    # Kaskádové mazání potřebuje kolekce načtené předem (raise_on_sql)
+    result = await db.execute(
+        select(Carrier)
+        .options(
+            selectinload(Carrier.depots),
+            selectinload(Carrier.contracts),
+            selectinload(Carrier.prices)
+        )
+        .where(Carrier.id == carrier_id)
+    )
     carrier = result.scalar_one_or_none()
     
     if not carrier:
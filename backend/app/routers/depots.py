@@ -7,7 +7,7 @@ from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy import select, and_, or_
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import joinedload, selectinload
 
 from app.database import get_db
 from app.models import Depot, Carrier, DepotNameMapping, RouteDepotHistory
@@ -29,9 +29,11 @@ async def get_depots(
     db: AsyncSession = Depends(get_db)
 ):
     """Get all depots with optional filters"""
+    # Vlastník i provozovatel jsou many-to-one na Carrier - dva LEFT JOINy
+    # v hlavním dotazu místo dvou dalších round-tripů
     query = select(Depot).options(
-        selectinload(Depot.carrier),
-        selectinload(Depot.operator_carrier)
+        joinedload(Depot.carrier),
+        joinedload(Depot.operator_carrier)
     )
     
     if carrier_id:
@@ -92,7 +94,7 @@ async def get_depots(
 async def get_depot_stats(db: AsyncSession = Depends(get_db)):
     """Statistiky dep - počet tras, typ provozovatele."""
     query = select(Depot).options(
-        selectinload(Depot.operator_carrier),
+        joinedload(Depot.operator_carrier),
         selectinload(Depot.route_depot_history)
     )
     
@@ -218,8 +220,8 @@ async def get_depot(depot_id: int, db: AsyncSession = Depends(get_db)):
     result = await db.execute(
         select(Depot)
         .options(
-            selectinload(Depot.carrier),
-            selectinload(Depot.operator_carrier),
+            joinedload(Depot.carrier),
+            joinedload(Depot.operator_carrier),
             selectinload(Depot.linehaul_from),
             selectinload(Depot.linehaul_to),
             selectinload(Depot.route_depot_history)
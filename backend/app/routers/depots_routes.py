@@ -7,7 +7,7 @@ from typing import Optional, List
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy import select, and_, or_
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import joinedload, selectinload
 from pydantic import BaseModel
 
 from app.database import get_db
@@ -112,7 +112,7 @@ async def get_depots(
 ):
     """Získá seznam všech dep."""
     query = select(Depot).options(
-        selectinload(Depot.operator_carrier)
+        joinedload(Depot.operator_carrier)
     )
     
     if operator_type:
@@ -148,7 +148,7 @@ async def get_depots(
 async def get_depot(depot_id: int, db: AsyncSession = Depends(get_db)):
     """Získá detail depa."""
     query = select(Depot).options(
-        selectinload(Depot.operator_carrier)
+        joinedload(Depot.operator_carrier)
     ).where(Depot.id == depot_id)
     
     result = await db.execute(query)
@@ -252,10 +252,8 @@ async def get_routes(
     db: AsyncSession = Depends(get_db)
 ):
     """Získá seznam všech tras s aktuálním depem a dopravcem."""
-    query = select(Route).options(
-        selectinload(Route.depot_history).selectinload(RouteDepotHistory.depot),
-        selectinload(Route.carrier_history).selectinload(RouteCarrierHistory.carrier)
-    )
+    now = datetime.utcnow()
+    query = Route.query_with_current(now)
     
     if region:
         query = query.where(Route.region == region)
@@ -268,7 +266,6 @@ async def get_routes(
     result = await db.execute(query)
     routes = result.scalars().all()
     
-    now = datetime.utcnow()
     response = []
     
     for route in routes:
@@ -4,7 +4,7 @@ Výpočet očekávané fakturace na základě plánovacích souborů a ceníků
 Updated: 2025-12-05 - Využívá depot_id, route_category, from_warehouse_id
 """
 from typing import Optional, Dict, List
-from datetime import datetime, date
+from datetime import datetime, date, time
 from decimal import Decimal
 from calendar import monthrange
 from fastapi import APIRouter, Depends, HTTPException, Query
@@ -26,6 +26,9 @@ router = APIRouter()
 # KONFIGURACE - MAPOVÁNÍ
 # =============================================================================
 
+# Trasy začínající před polednem jsou DPO, ostatní SD
+NOON = time(12, 0)
+
 START_LOCATION_TO_CATEGORY = {
     'Depo Chrášťany': 'DIRECT_SKLAD',
     'Třídírna': 'DIRECT_SKLAD',
@@ -562,7 +565,7 @@ async def calculate_expected_billing(
                         daily_breakdown[day_key]['sdRoutes'] += 1
                     else:
                         # Default podle času startu
-                        if route.start_time and route.start_time < '12:00':
+                        if route.start_time and route.start_time < NOON:
                             daily_breakdown[day_key]['dpoRoutes'] += 1
                         else:
                             daily_breakdown[day_key]['sdRoutes'] += 1
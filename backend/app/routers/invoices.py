@@ -8,12 +8,13 @@ import re
 from io import BytesIO
 from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Form
 from sqlalchemy import select, and_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 import pdfplumber
 
 from app.database import get_db
-from app.models import Invoice, InvoiceItem, Carrier, Proof
+from app.models import Invoice, InvoiceItem, Carrier, Proof, with_loaded
 from app.schemas import (
     InvoiceResponse, InvoiceCreate, InvoiceUpdate, InvoiceParsedData
 )
@@ -136,12 +137,25 @@ def parse_invoice_pdf(file_content: bytes) -> InvoiceParsedData:
     return result
 
 
+INVOICE_NUMBER_CONSTRAINT = "uq_invoice_carrier_number"
+
+
+def is_duplicate_invoice_number(error: IntegrityError) -> bool:
+    """Je chyba porušením unikátního čísla faktury (ne např. neexistující proof)?"""
+    # asyncpg nese název porušeného constraintu přímo na výjimce
+    constraint_name = getattr(error.orig.__cause__, "constraint_name", None)
+    if constraint_name is not None:
+        return constraint_name == INVOICE_NUMBER_CONSTRAINT
+    # Ostatní drivery - podle textu chyby (SQLite uvádí jen sloupce)
+    message = str(error.orig)
+    return INVOICE_NUMBER_CONSTRAINT in message or "Invoice.invoiceNumber" in message
+
+
 async def get_invoice_by_id(invoice_id: int, db: AsyncSession):
     """Helper to get invoice with relations"""
     result = await db.execute(
         select(Invoice)
         .options(
-            selectinload(Invoice.carrier),
             selectinload(Invoice.proof),
             selectinload(Invoice.items)
         )
@@ -161,10 +175,7 @@ async def get_invoices(
     db: AsyncSession = Depends(get_db)
 ):
     """Get all invoices with filters"""
-    query = select(Invoice).options(
-        selectinload(Invoice.carrier),
-        selectinload(Invoice.items)
-    )
+    query = select(Invoice).options(*with_loaded(Invoice.items))
     
     filters = []
     if carrier_id:
@@ -197,17 +208,6 @@ async def create_invoice(
     if not carrier_result.scalar_one_or_none():
         raise HTTPException(status_code=400, detail="Carrier not found")
     
-    existing = await db.execute(
-        select(Invoice).where(
-            and_(
-                Invoice.carrier_id == invoice_data.carrier_id,
-                Invoice.invoice_number == invoice_data.invoice_number
-            )
-        )
-    )
-    if existing.scalar_one_or_none():
-        raise HTTPException(status_code=400, detail="Invoice with this number already exists")
-    
     invoice = Invoice(
         carrier_id=invoice_data.carrier_id,
         proof_id=invoice_data.proof_id,
@@ -221,7 +221,15 @@ async def create_invoice(
         status=invoice_data.status
     )
     db.add(invoice)
-    await db.flush()
+    
+    # Duplicitu čísla faktury hlídá unikátní index (carrierId, invoiceNumber)
+    try:
+        await db.flush()
+    except IntegrityError as e:
+        await db.rollback()
+        if not is_duplicate_invoice_number(e):
+            raise
+        raise HTTPException(status_code=400, detail="Invoice with this number already exists")
     
     if invoice_data.items:
         for item in invoice_data.items:
@@ -256,17 +264,6 @@ async def upload_invoice(
     if not parsed.invoice_number:
         raise HTTPException(status_code=400, detail="Could not extract invoice number from PDF")
     
-    existing = await db.execute(
-        select(Invoice).where(
-            and_(
-                Invoice.carrier_id == carrier_id,
-                Invoice.invoice_number == parsed.invoice_number
-            )
-        )
-    )
-    if existing.scalar_one_or_none():
-        raise HTTPException(status_code=400, detail=f"Invoice {parsed.invoice_number} already exists")
-    
     invoice_period = parsed.period or period
     
     proof_result = await db.execute(
@@ -290,7 +287,14 @@ async def upload_invoice(
         status='pending'
     )
     db.add(invoice)
-    await db.flush()
+    
+    try:
+        await db.flush()
+    except IntegrityError as e:
+        await db.rollback()
+        if not is_duplicate_invoice_number(e):
+            raise
+        raise HTTPException(status_code=400, detail=f"Invoice {parsed.invoice_number} already exists")
     
     if parsed.item_type and parsed.total_without_vat:
         db.add(InvoiceItem(
@@ -240,6 +240,9 @@ async def update_price_config(
     for field, value in update_data.items():
         setattr(price_config, field, value)
     
+    # updatedAt se mění i při výměně samotných sazeb - je součástí klíče cache map sazeb
+    price_config.updated_at = datetime.utcnow()
+    
     # Replace rates if provided - with new fields
     if config_data.fix_rates is not None:
         await db.execute(
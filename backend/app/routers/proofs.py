@@ -6,14 +6,15 @@ from datetime import datetime
 from decimal import Decimal
 from io import BytesIO
 from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Form
-from sqlalchemy import select, and_
+from sqlalchemy import select, insert, and_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 import openpyxl
 
 from app.database import get_db
 from app.models import (
-    Proof, Carrier, ProofRouteDetail, ProofLinehaulDetail, ProofDepoDetail, ProofDailyDetail, ProofAnalysis
+    Proof, Carrier, ProofRouteDetail, ProofLinehaulDetail, ProofDepoDetail, ProofDailyDetail, ProofAnalysis,
+    with_loaded,
 )
 from app.schemas import ProofResponse, ProofDetailResponse, ProofUpdate
 
@@ -513,6 +514,7 @@ def parse_proof_from_xlsx(file_content: bytes) -> dict:
             if total:
                 result['linehaul_details'].append({
                     'description': str(desc),
+                    'vehicle_type': label,
                     'days': int(days) if days else 0,
                     'rate': float(rate) if rate else 0,
                     'total': float(total) if total else 0,
@@ -552,10 +554,8 @@ async def get_proofs(
     db: AsyncSession = Depends(get_db)
 ):
     """Get all proofs with filters"""
-    query = select(Proof).options(
-        selectinload(Proof.carrier),
-        selectinload(Proof.depot)
-    )
+    # ProofResponse nepotřebuje žádný vztah - bez výchozího selectin/joined načítání
+    query = select(Proof).options(*with_loaded())
     
     filters = []
     if carrier_id:
@@ -631,84 +631,97 @@ async def upload_proof(
         total_linehaul=proof_data['totals'].get('total_linehaul'),
         total_depo=proof_data['totals'].get('total_depo'),
         total_penalty=proof_data['totals'].get('total_penalty'),
-        total_posily=proof_data['totals'].get('total_posily'),
+        # Posily LINEHAUL nemají vlastní sloupec - jsou jen v grandTotal
         grand_total=proof_data['totals'].get('grand_total'),
     )
     db.add(proof)
     await db.flush()
     
-    # Add route details
-    for rd in proof_data['route_details']:
-        detail = ProofRouteDetail(
-            proof_id=proof.id,
-            route_type=rd['route_type'],
-            routes_count=rd['count'],
-            count=rd['count'],
-            rate=Decimal(str(rd['rate'])),
-            amount=Decimal(str(rd['amount'])),
-        )
-        db.add(detail)
-    
-    # Add linehaul details
-    for ld in proof_data['linehaul_details']:
-        detail = ProofLinehaulDetail(
-            proof_id=proof.id,
-            description=ld['description'],
-            days=ld['days'],
-            rate=Decimal(str(ld['rate'])),
-            total=Decimal(str(ld['total'])),
-        )
-        db.add(detail)
-    
-    # Add depo details
-    for dd in proof_data['depo_details']:
-        detail = ProofDepoDetail(
-            proof_id=proof.id,
-            depo_name=dd['depo_name'],
-            rate_type=dd['rate_type'],
-            days=dd['days'],
-            rate=Decimal(str(dd['rate'])),
-            amount=Decimal(str(dd['amount'])),
-        )
-        db.add(detail)
+    # Detaily vkládáme hromadně (executemany / multi-row VALUES), ne po objektech.
+    # insert(model) neznámé klíče tiše zahodí - klíče musí odpovídat atributům modelu
+    route_rows = [
+        {
+            'proof_id': proof.id,
+            'route_name': rd['route_type'],
+            'route_type': rd['route_type'],
+            'trips_count': rd['count'],
+            'total_amount': Decimal(str(rd['amount'])),
+        }
+        for rd in proof_data['route_details']
+    ]
+    
+    # Sumář neuvádí trasu linehaulu zvlášť - popis řádku jde do fromLocation
+    linehaul_rows = [
+        {
+            'proof_id': proof.id,
+            'from_location': ld['description'],
+            'to_location': '',
+            'vehicle_type': ld['vehicle_type'],
+            'trips_count': ld['days'],
+            'rate': Decimal(str(ld['rate'])),
+            'total_amount': Decimal(str(ld['total'])),
+        }
+        for ld in proof_data['linehaul_details']
+    ]
+    
+    depo_rows = [
+        {
+            'proof_id': proof.id,
+            'depo_name': dd['depo_name'],
+            'service_type': dd['rate_type'],
+            'quantity': Decimal(dd['days']),
+            'rate': Decimal(str(dd['rate'])),
+            'total_amount': Decimal(str(dd['amount'])),
+        }
+        for dd in proof_data['depo_details']
+    ]
     
-    # Add daily details
-    for daily in proof_data['daily_details']:
-        detail = ProofDailyDetail(
-            proof_id=proof.id,
-            date=daily['date'],
+    daily_rows = [
+        {
+            'proof_id': proof.id,
+            'date': daily['date'],
             # Celkem
-            dr_dpo_count=daily['dr_dpo_count'],
-            lh_dpo_count=daily['lh_dpo_count'],
-            dr_sd_count=daily['dr_sd_count'],
-            lh_sd_count=daily['lh_sd_count'],
+            'dr_dpo_count': daily['dr_dpo_count'],
+            'lh_dpo_count': daily['lh_dpo_count'],
+            'dr_sd_count': daily['dr_sd_count'],
+            'lh_sd_count': daily['lh_sd_count'],
             # Vratimov
-            vratimov_dr_dpo=daily.get('vratimov_dr_dpo', 0),
-            vratimov_lh_dpo=daily.get('vratimov_lh_dpo', 0),
-            vratimov_dr_sd=daily.get('vratimov_dr_sd', 0),
-            vratimov_lh_sd=daily.get('vratimov_lh_sd', 0),
+            'vratimov_dr_dpo': daily.get('vratimov_dr_dpo', 0),
+            'vratimov_lh_dpo': daily.get('vratimov_lh_dpo', 0),
+            'vratimov_dr_sd': daily.get('vratimov_dr_sd', 0),
+            'vratimov_lh_sd': daily.get('vratimov_lh_sd', 0),
             # Nový Bydžov
-            bydzov_dr_dpo=daily.get('bydzov_dr_dpo', 0),
-            bydzov_lh_dpo=daily.get('bydzov_lh_dpo', 0),
-            bydzov_dr_sd=daily.get('bydzov_dr_sd', 0),
-            bydzov_lh_sd=daily.get('bydzov_lh_sd', 0),
+            'bydzov_dr_dpo': daily.get('bydzov_dr_dpo', 0),
+            'bydzov_lh_dpo': daily.get('bydzov_lh_dpo', 0),
+            'bydzov_dr_sd': daily.get('bydzov_dr_sd', 0),
+            'bydzov_lh_sd': daily.get('bydzov_lh_sd', 0),
             # KM - Celkem
-            dr_dpo_km=Decimal(str(daily['dr_dpo_km'])) if daily['dr_dpo_km'] else Decimal('0'),
-            lh_dpo_km=Decimal(str(daily['lh_dpo_km'])) if daily['lh_dpo_km'] else Decimal('0'),
-            dr_sd_km=Decimal(str(daily['dr_sd_km'])) if daily['dr_sd_km'] else Decimal('0'),
-            lh_sd_km=Decimal(str(daily['lh_sd_km'])) if daily['lh_sd_km'] else Decimal('0'),
+            'dr_dpo_km': Decimal(str(daily['dr_dpo_km'])) if daily['dr_dpo_km'] else Decimal('0'),
+            'lh_dpo_km': Decimal(str(daily['lh_dpo_km'])) if daily['lh_dpo_km'] else Decimal('0'),
+            'dr_sd_km': Decimal(str(daily['dr_sd_km'])) if daily['dr_sd_km'] else Decimal('0'),
+            'lh_sd_km': Decimal(str(daily['lh_sd_km'])) if daily['lh_sd_km'] else Decimal('0'),
             # KM - Vratimov
-            vratimov_dr_dpo_km=Decimal(str(daily.get('vratimov_dr_dpo_km', 0))),
-            vratimov_lh_dpo_km=Decimal(str(daily.get('vratimov_lh_dpo_km', 0))),
-            vratimov_dr_sd_km=Decimal(str(daily.get('vratimov_dr_sd_km', 0))),
-            vratimov_lh_sd_km=Decimal(str(daily.get('vratimov_lh_sd_km', 0))),
+            'vratimov_dr_dpo_km': Decimal(str(daily.get('vratimov_dr_dpo_km', 0))),
+            'vratimov_lh_dpo_km': Decimal(str(daily.get('vratimov_lh_dpo_km', 0))),
+            'vratimov_dr_sd_km': Decimal(str(daily.get('vratimov_dr_sd_km', 0))),
+            'vratimov_lh_sd_km': Decimal(str(daily.get('vratimov_lh_sd_km', 0))),
             # KM - Nový Bydžov
-            bydzov_dr_dpo_km=Decimal(str(daily.get('bydzov_dr_dpo_km', 0))),
-            bydzov_lh_dpo_km=Decimal(str(daily.get('bydzov_lh_dpo_km', 0))),
-            bydzov_dr_sd_km=Decimal(str(daily.get('bydzov_dr_sd_km', 0))),
-            bydzov_lh_sd_km=Decimal(str(daily.get('bydzov_lh_sd_km', 0))),
-        )
-        db.add(detail)
+            'bydzov_dr_dpo_km': Decimal(str(daily.get('bydzov_dr_dpo_km', 0))),
+            'bydzov_lh_dpo_km': Decimal(str(daily.get('bydzov_lh_dpo_km', 0))),
+            'bydzov_dr_sd_km': Decimal(str(daily.get('bydzov_dr_sd_km', 0))),
+            'bydzov_lh_sd_km': Decimal(str(daily.get('bydzov_lh_sd_km', 0))),
+        }
+        for daily in proof_data['daily_details']
+    ]
+    
+    for model, rows in (
+        (ProofRouteDetail, route_rows),
+        (ProofLinehaulDetail, linehaul_rows),
+        (ProofDepoDetail, depo_rows),
+        (ProofDailyDetail, daily_rows),
+    ):
+        if rows:
+            await db.execute(insert(model), rows)
     
     await db.commit()
     
@@ -716,7 +729,6 @@ async def upload_proof(
     result = await db.execute(
         select(Proof)
         .options(
-            selectinload(Proof.carrier),
             selectinload(Proof.route_details),
             selectinload(Proof.linehaul_details),
             selectinload(Proof.depo_details),
@@ -735,8 +747,6 @@ async def get_proof(proof_id: int, db: AsyncSession = Depends(get_db)):
     result = await db.execute(
         select(Proof)
         .options(
-            selectinload(Proof.carrier),
-            selectinload(Proof.depot),
             selectinload(Proof.route_details),
             selectinload(Proof.linehaul_details),
             selectinload(Proof.depo_details),
@@ -755,16 +765,32 @@ async def get_proof(proof_id: int, db: AsyncSession = Depends(get_db)):
 async def get_proof_daily_details(proof_id: int, db: AsyncSession = Depends(get_db)):
     """Get daily breakdown for a proof (counts and km)"""
     result = await db.execute(
-        select(Proof)
-        .options(selectinload(Proof.daily_details))
-        .where(Proof.id == proof_id)
+        select(Proof.id, Proof.period).where(Proof.id == proof_id)
     )
-    proof = result.scalar_one_or_none()
+    proof = result.one_or_none()
     if not proof:
         raise HTTPException(status_code=404, detail="Proof not found")
     
+    # Jen potřebné sloupce jako Row tuply - bez ORM instancí a výchozích
+    # selectin kolekcí Proofu, řazení dělá index (proofId, date)
+    result = await db.execute(
+        select(
+            ProofDailyDetail.date,
+            ProofDailyDetail.dr_dpo_count,
+            ProofDailyDetail.lh_dpo_count,
+            ProofDailyDetail.dr_sd_count,
+            ProofDailyDetail.lh_sd_count,
+            ProofDailyDetail.dr_dpo_km,
+            ProofDailyDetail.lh_dpo_km,
+            ProofDailyDetail.dr_sd_km,
+            ProofDailyDetail.lh_sd_km,
+        )
+        .where(ProofDailyDetail.proof_id == proof_id)
+        .order_by(ProofDailyDetail.date)
+    )
+    
     daily_data = []
-    for detail in sorted(proof.daily_details, key=lambda x: x.date):
+    for detail in result:
         daily_data.append({
             'date': detail.date.strftime('%Y-%m-%d'),
             # Počty
@@ -5,13 +5,13 @@ UPDATED: Aggregated comparison - proof vs all plans valid in the month
 UPDATED: 2025-12-09 - Integrated depot_resolver for automatic depot creation from start_location
 """
 from typing import List, Optional
-from datetime import datetime, timedelta
+from datetime import datetime, time, timedelta
 from decimal import Decimal
 from io import BytesIO
 import re
 import calendar
 from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Form
-from sqlalchemy import select, and_, or_
+from sqlalchemy import select, insert, and_, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 import openpyxl
@@ -20,6 +20,7 @@ from app.database import get_db
 from app.models import RoutePlan, RoutePlanRoute, RoutePlanDetail, Carrier, Proof, Route, RouteDepotHistory, RouteCarrierHistory
 from app.depot_resolver import resolve_all_depots_for_plan
 from app.route_resolver import resolve_all_routes_for_plan
+from app.schemas import format_clock_time, format_duration
 
 router = APIRouter()
 
@@ -61,6 +62,31 @@ def parse_work_time_to_minutes(work_time_str) -> int:
     return 0
 
 
+def parse_clock_time(time_str: Optional[str]) -> Optional[time]:
+    """Convert 'HH:MM' (or 'HH:MM:SS') string to time, None for empty/invalid values"""
+    if not time_str:
+        return None
+    try:
+        parts = [int(p) for p in time_str.split(':')]
+        return time(*parts[:3])
+    except (ValueError, TypeError):
+        return None
+
+
+def parse_duration(duration_str: Optional[str]) -> Optional[timedelta]:
+    """Convert work_time string (HH:MM) to timedelta ('0:00' -> timedelta(0)), None for empty/invalid values"""
+    if not duration_str or not isinstance(duration_str, str):
+        return None
+    
+    parts = duration_str.split(':')
+    if len(parts) < 2:
+        return None
+    try:
+        return timedelta(hours=int(parts[0]), minutes=int(parts[1]))
+    except ValueError:
+        return None
+
+
 def determine_route_type(start_time) -> str:
     """Determine if route is DPO (morning) or SD (afternoon) based on start time"""
     hour = parse_time_to_hour(start_time)
@@ -833,6 +859,7 @@ async def upload_route_plan(
     # Create new plan
     route_plan = RoutePlan(
         carrier_id=carrier_id,
+        plan_date=parsed_date,
         valid_from=parsed_date,
         file_name=file.filename,
         plan_type=plan_type,
@@ -859,8 +886,8 @@ async def upload_route_plan(
     db.add(route_plan)
     await db.flush()
     
-    # Create routes with depot_id and route_id
-    route_map = {}
+    # Create routes with depot_id and route_id - jedním hromadným INSERTem
+    route_rows = []
     for route_data in plan_data['routes']:
         # Get depot_id from lookup
         start_loc = (route_data.get('start_location') or '').strip()
@@ -870,27 +897,27 @@ async def upload_route_plan(
         route_name = (route_data.get('route_name') or '').strip()
         route_id = route_lookup.get(route_name) if route_name else None
         
-        route = RoutePlanRoute(
-            route_plan_id=route_plan.id,
-            route_name=route_data['route_name'],
-            route_letter=route_data['route_letter'],
-            carrier_name=route_data['carrier_name'],
-            route_type=route_data['route_type'],
-            dr_lh=route_data['delivery_type'],
-            depot=route_data.get('depot'),
-            depot_id=depot_id,  # FK to Depot table
-            route_id=route_id,  # NEW: FK to Route master table
-            start_location=route_data['start_location'],
-            stops_count=route_data['stops_count'],
-            max_capacity=route_data['max_capacity'],
-            start_time=route_data['start_time'],
-            end_time=route_data['end_time'],
-            work_time=route_data['work_time'],
-            total_distance_km=route_data['distance_km'],
-        )
-        db.add(route)
-        await db.flush()
-        route_map[route_data['route_name']] = route.id
+        route_rows.append({
+            'route_plan_id': route_plan.id,
+            'route_name': route_data['route_name'],
+            'route_letter': route_data['route_letter'],
+            'carrier_name': route_data['carrier_name'],
+            'route_type': route_data['route_type'],
+            'dr_lh': route_data['delivery_type'],
+            'depot': route_data.get('depot'),
+            'depot_id': depot_id,  # FK to Depot table
+            'route_id': route_id,  # NEW: FK to Route master table
+            'start_location': route_data['start_location'],
+            'stops_count': route_data['stops_count'],
+            'max_capacity': route_data['max_capacity'],
+            'start_time': parse_clock_time(route_data['start_time']),
+            'end_time': parse_clock_time(route_data['end_time']),
+            'work_time': parse_duration(route_data['work_time']),
+            'total_distance_km': route_data['distance_km'],
+        })
+    
+    if route_rows:
+        await db.execute(insert(RoutePlanRoute), route_rows)
     
     # Update validity of all plans for this carrier and plan type
     await update_route_plan_validity(carrier_id, db, plan_type)
@@ -997,6 +1024,7 @@ async def upload_route_plans_batch(
             # Create new plan
             route_plan = RoutePlan(
                 carrier_id=carrier_id,
+                plan_date=parsed_date,
                 valid_from=parsed_date,
                 file_name=file.filename,
                 plan_type=plan_type,
@@ -1023,7 +1051,8 @@ async def upload_route_plans_batch(
             db.add(route_plan)
             await db.flush()
             
-            # Create routes with depot_id and route_id
+            # Create routes with depot_id and route_id - jedním hromadným INSERTem
+            route_rows = []
             for route_data in plan_data['routes']:
                 start_loc = (route_data.get('start_location') or '').strip()
                 depot_id = depot_lookup.get(start_loc) if start_loc else None
@@ -1032,25 +1061,27 @@ async def upload_route_plans_batch(
                 route_name = (route_data.get('route_name') or '').strip()
                 route_id = route_lookup.get(route_name) if route_name else None
                 
-                route = RoutePlanRoute(
-                    route_plan_id=route_plan.id,
-                    route_name=route_data['route_name'],
-                    route_letter=route_data['route_letter'],
-                    carrier_name=route_data['carrier_name'],
-                    route_type=route_data['route_type'],
-                    delivery_type=route_data['delivery_type'],
-                    depot=route_data.get('depot'),
-                    depot_id=depot_id,  # FK to Depot table
-                    route_id=route_id,  # NEW: FK to Route master table
-                    start_location=route_data['start_location'],
-                    stops_count=route_data['stops_count'],
-                    max_capacity=route_data['max_capacity'],
-                    start_time=route_data['start_time'],
-                    end_time=route_data['end_time'],
-                    work_time=route_data['work_time'],
-                    distance_km=route_data['distance_km'],
-                )
-                db.add(route)
+                route_rows.append({
+                    'route_plan_id': route_plan.id,
+                    'route_name': route_data['route_name'],
+                    'route_letter': route_data['route_letter'],
+                    'carrier_name': route_data['carrier_name'],
+                    'route_type': route_data['route_type'],
+                    'dr_lh': route_data['delivery_type'],
+                    'depot': route_data.get('depot'),
+                    'depot_id': depot_id,  # FK to Depot table
+                    'route_id': route_id,  # NEW: FK to Route master table
+                    'start_location': route_data['start_location'],
+                    'stops_count': route_data['stops_count'],
+                    'max_capacity': route_data['max_capacity'],
+                    'start_time': parse_clock_time(route_data['start_time']),
+                    'end_time': parse_clock_time(route_data['end_time']),
+                    'work_time': parse_duration(route_data['work_time']),
+                    'total_distance_km': route_data['distance_km'],
+                })
+            
+            if route_rows:
+                await db.execute(insert(RoutePlanRoute), route_rows)
             
             plan_types_updated.add(plan_type)
             
@@ -1102,7 +1133,6 @@ async def compare_plans_vs_proof(
         .options(
             selectinload(Proof.route_details),
             selectinload(Proof.linehaul_details),
-            selectinload(Proof.carrier),
         )
         .where(Proof.id == proof_id)
     )
@@ -1283,9 +1313,9 @@ async def get_route_plan(plan_id: int, db: AsyncSession = Depends(get_db)):
                 'startLocation': r.start_location,
                 'stopsCount': r.stops_count,
                 'maxCapacity': r.max_capacity,
-                'startTime': r.start_time,
-                'endTime': r.end_time,
-                'workTime': r.work_time,
+                'startTime': format_clock_time(r.start_time),
+                'endTime': format_clock_time(r.end_time),
+                'workTime': format_duration(r.work_time),
                 'distanceKm': float(r.distance_km) if r.distance_km else 0,
             }
             for r in plan.routes
@@ -1450,7 +1480,6 @@ async def get_daily_breakdown(
     proof_result = await db.execute(
         select(Proof)
         .options(
-            selectinload(Proof.carrier),
             selectinload(Proof.daily_details),
         )
         .where(Proof.id == proof_id)
@@ -96,12 +96,12 @@ def get_current_carrier_for_route(route: Route, as_of: datetime = None) -> Optio
             return history.carrier
     return None
 
-def route_to_response(route: Route) -> dict:
+def route_to_response(
+    route: Route,
+    current_depot: Optional[Depot],
+    current_carrier: Optional[Carrier]
+) -> dict:
     """Konvertuje Route na response dict."""
-    now = datetime.utcnow()
-    current_depot = get_current_depot_for_route(route, now)
-    current_carrier = get_current_carrier_for_route(route, now)
-    
     return {
         "id": route.id,
         "routeName": route.route_name,
@@ -132,10 +132,8 @@ async def get_routes(
     db: AsyncSession = Depends(get_db)
 ):
     """Získá seznam všech tras s aktuálním depem a dopravcem."""
-    query = select(Route).options(
-        selectinload(Route.depot_history).selectinload(RouteDepotHistory.depot),
-        selectinload(Route.carrier_history).selectinload(RouteCarrierHistory.carrier)
-    )
+    now = datetime.utcnow()
+    query = Route.query_with_current(now)
     
     if region:
         query = query.where(Route.region == region)
@@ -148,7 +146,6 @@ async def get_routes(
     result = await db.execute(query)
     routes = result.scalars().all()
     
-    now = datetime.utcnow()
     response = []
     
     for route in routes:
@@ -161,7 +158,7 @@ async def get_routes(
         if carrier_id and (current_carrier is None or current_carrier.id != carrier_id):
             continue
         
-        response.append(route_to_response(route))
+        response.append(route_to_response(route, current_depot, current_carrier))
     
     return response
 
@@ -190,18 +187,17 @@ async def get_routes_by_region(db: AsyncSession = Depends(get_db)):
 @router.get("/{route_id}")
 async def get_route(route_id: int, db: AsyncSession = Depends(get_db)):
     """Získá detail trasy."""
-    query = select(Route).options(
-        selectinload(Route.depot_history).selectinload(RouteDepotHistory.depot),
-        selectinload(Route.carrier_history).selectinload(RouteCarrierHistory.carrier)
-    ).where(Route.id == route_id)
-    
-    result = await db.execute(query)
-    route = result.scalar_one_or_none()
+    route = await db.get(Route, route_id)
     
     if not route:
         raise HTTPException(status_code=404, detail="Route not found")
     
-    return route_to_response(route)
+    # Detail potřebuje jen aktuální záznamy - jeden řádek z každé historie
+    now = datetime.utcnow()
+    current_depot = await Route.current_depot(db, route_id, now)
+    current_carrier = await Route.current_carrier(db, route_id, now)
+    
+    return route_to_response(route, current_depot, current_carrier)
 
 
 @router.post("", status_code=201)
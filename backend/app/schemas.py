@@ -4,10 +4,10 @@ Updated: 2025-12-05 - Added depot_id, route_category, from_warehouse_id fields
 Updated: 2025-12-09 - Fixed DepotResponse/DepotCreate carrier_id to Optional for ALZA depots
 Updated: 2025-12-09 - Fixed AlzaBoxResponse: box_id→code, added alza_id, removed address/zip_code
 """
-from datetime import datetime
+from datetime import datetime, time, timedelta
 from decimal import Decimal
 from typing import Optional, List
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, field_validator
 
 
 def to_camel(string: str) -> str:
@@ -443,6 +443,7 @@ class InvoiceBase(BaseModel):
 
 
 class InvoiceCreate(InvoiceBase):
+    status: str = "pending"
     items: Optional[List[InvoiceItemBase]] = None
 
 
@@ -484,7 +485,34 @@ class InvoiceParsedData(BaseModel):
 # ROUTE PLAN SCHEMAS
 # =============================================================================
 
-class RoutePlanRouteBase(BaseModel):
+def format_clock_time(value: Optional[time]) -> Optional[str]:
+    """Format time back to 'HH:MM' as returned by the API"""
+    return value.strftime('%H:%M') if value is not None else None
+
+
+def format_duration(value: Optional[timedelta]) -> Optional[str]:
+    """Format timedelta back to 'HH:MM' (hours can exceed 24)"""
+    if value is None:
+        return None
+    total_minutes = int(value.total_seconds()) // 60
+    return f"{total_minutes // 60:02d}:{total_minutes % 60:02d}"
+
+
+class RouteTimesAsText(BaseModel):
+    """Časy trasy jsou v DB TIME/INTERVAL, v API zůstávají řetězce 'HH:MM'"""
+
+    @field_validator('start_time', 'end_time', mode='before', check_fields=False)
+    @classmethod
+    def _clock_time_as_text(cls, value):
+        return format_clock_time(value) if isinstance(value, time) else value
+
+    @field_validator('work_time', mode='before', check_fields=False)
+    @classmethod
+    def _duration_as_text(cls, value):
+        return format_duration(value) if isinstance(value, timedelta) else value
+
+
+class RoutePlanRouteBase(RouteTimesAsText):
     route_name: str
     carrier_name: Optional[str] = None
     stops_count: int = 0
@@ -499,7 +527,7 @@ class RoutePlanRouteBase(BaseModel):
     plan_type: Optional[str] = None
 
 
-class RoutePlanRouteResponse(CamelModel):
+class RoutePlanRouteResponse(CamelModel, RouteTimesAsText):
     id: int
     route_name: str
     carrier_name: Optional[str] = None
@@ -0,0 +1,122 @@
+"""
+Společné fixtures - API nad in-memory SQLite místo PostgreSQL
+
+Testy běží s QUERY_BUDGET_STRICT=1: nenačtené kolekce (DEFAULT_LAZY) vyhodí
+chybu hned a překročení rozpočtu SQL dotazů endpointu shodí request.
+"""
+import asyncio
+import os
+from datetime import datetime
+from decimal import Decimal
+
+# Musí být nastaveno před importem app - DEFAULT_LAZY a middleware to čtou při importu
+os.environ["QUERY_BUDGET_STRICT"] = "1"
+os.environ.pop("API_KEY", None)
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base, get_db
+from app.main import app
+from app.middleware import track_queries
+from app.models import (
+    Carrier, Depot, Invoice, InvoiceItem, Proof, ProofDailyDetail,
+    ProofDepoDetail, ProofRouteDetail,
+)
+
+
+@compiles(JSONB, "sqlite")
+def _compile_jsonb_sqlite(type_, compiler, **kw):
+    return "JSON"
+
+
+def _register_pg_functions(dbapi_connection, connection_record):
+    # server_default=UTC_NOW -> timezone('UTC', now())
+    dbapi_connection.create_function("timezone", 2, lambda zone, value: value)
+    dbapi_connection.create_function("now", 0, lambda: "2025-01-01 00:00:00")
+    # SQLite cizí klíče bez pragmy nekontroluje
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+@pytest.fixture
+def engine():
+    test_engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    event.listen(test_engine.sync_engine, "connect", _register_pg_functions)
+    track_queries(test_engine)
+
+    async def create_schema():
+        async with test_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    asyncio.run(create_schema())
+    yield test_engine
+    asyncio.run(test_engine.dispose())
+
+
+@pytest.fixture
+def session_factory(engine):
+    return async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest.fixture
+def db(session_factory):
+    """Synchronní pomocník pro přípravu dat: db(async_fn) -> async_fn(session)."""
+    def run(fn):
+        async def wrapper():
+            async with session_factory() as session:
+                return await fn(session)
+        return asyncio.run(wrapper())
+    return run
+
+
+@pytest.fixture
+def client(session_factory):
+    async def override_get_db():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    # Bez `with` - lifespan by spouštěl create_all/migrace proti produkční DB
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def proof_with_invoice(db):
+    """Proof se všemi druhy vztahů a fakturou s položkami - pro list endpointy pod raiseload."""
+    async def create(session):
+        carrier = Carrier(name='Drivecool')
+        depot = Depot(name='Depo Drivecool', code='DRIVECOOL')
+        session.add_all([carrier, depot])
+        await session.flush()
+        proof = Proof(
+            carrier_id=carrier.id, depot_id=depot.id, period='01/2025',
+            period_date=datetime(2025, 1, 1), total_fix=Decimal('10000'),
+            total_depo=Decimal('2000'), grand_total=Decimal('12000'),
+            route_details=[ProofRouteDetail(route_name='DPO', trips_count=20)],
+            depo_details=[ProofDepoDetail(
+                depo_name='Vratimov', service_type='SKLAD', rate=Decimal('2000'),
+                total_amount=Decimal('2000'),
+            )],
+            daily_details=[ProofDailyDetail(date=datetime(2025, 1, 2), routes_count=5)],
+        )
+        session.add(proof)
+        await session.flush()
+        session.add(Invoice(
+            carrier_id=carrier.id, proof_id=proof.id, invoice_number='FV-2025-001',
+            period='01/2025', total_without_vat=Decimal('11500'),
+            items=[
+                InvoiceItem(item_type='fix', amount=Decimal('10000')),
+                InvoiceItem(item_type='depo', amount=Decimal('1500')),
+            ],
+        ))
+        await session.commit()
+        return proof.id
+    return db(create)
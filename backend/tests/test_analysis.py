@@ -0,0 +1,57 @@
+"""
+Analýza proofů - mapy sazeb z cache
+"""
+from datetime import datetime
+from decimal import Decimal
+
+from app.models import Carrier, DepoRate, Depot, PriceConfig
+from app.routers import analysis
+
+
+def add_price_config_with_depo_rate(db):
+    async def create(session):
+        carrier = Carrier(name='Drivecool')
+        depot = Depot(name='Depo Drivecool', code='DRIVECOOL')
+        session.add_all([carrier, depot])
+        await session.flush()
+        price_config = PriceConfig(carrier_id=carrier.id, valid_from=datetime(2025, 1, 1), is_active=True)
+        session.add(price_config)
+        await session.flush()
+        session.add(DepoRate(
+            price_config_id=price_config.id, depo_name='Vratimov', rate_type='SKLAD',
+            rate=Decimal('1500'), depot_id=depot.id,
+        ))
+        await session.commit()
+        return price_config.id, price_config.updated_at, depot.id
+    return db(create)
+
+
+def depo_rate_depot_code(db, price_config_id, updated_at):
+    async def load(session):
+        rate_maps = await analysis.get_rate_maps(session, price_config_id, updated_at)
+        return rate_maps['depo']['Vratimov_SKLAD']['depot_code']
+    return db(load)
+
+
+def test_rate_maps_follow_depot_code_change(client, db):
+    analysis._RATE_MAPS_CACHE.clear()
+    price_config_id, updated_at, depot_id = add_price_config_with_depo_rate(db)
+
+    assert depo_rate_depot_code(db, price_config_id, updated_at) == 'DRIVECOOL'
+    assert (price_config_id, updated_at) in analysis._RATE_MAPS_CACHE
+
+    # Úprava depa nemění updatedAt ceníku - mapy zůstávají v cache
+    response = client.put(f'/api/depots/{depot_id}', json={'code': 'VRATIMOV'})
+    assert response.status_code == 200, response.text
+
+    assert depo_rate_depot_code(db, price_config_id, updated_at) == 'VRATIMOV'
+
+
+def test_analysis_summary_loads_carrier_and_invoice_items(client, proof_with_invoice):
+    response = client.get('/api/analysis/summary')
+
+    assert response.status_code == 200, response.text
+    [summary] = response.json()
+    assert summary['proofId'] == proof_with_invoice
+    assert summary['carrierName'] == 'Drivecool'
+    assert (summary['proofTotal'], summary['invoicedTotal']) == (12000.0, 11500.0)
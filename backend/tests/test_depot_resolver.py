@@ -0,0 +1,41 @@
+"""
+Depot resolver - detekce depa ze startovního místa
+"""
+from datetime import datetime
+
+from app.depot_resolver import depot_values, detect_depot_info, resolve_all_depots_for_plan
+from app.models import Carrier
+
+
+def test_depot_values_reuse_detection_per_start_location():
+    detect_depot_info.cache_clear()
+
+    # Trasy se stejným startovním místem sdílí jeden záznam v cache
+    values = [depot_values('Depo Hosín', 7, datetime(2025, 8, 22)) for _ in range(3)]
+
+    assert detect_depot_info.cache_info()[:2] == (2, 1)
+    assert values[0] == {
+        'name': 'Depo Hosín', 'code': 'HOSIN', 'depot_type': 'DISTRIBUTION',
+        'operator_type': 'CARRIER', 'operator_carrier_id': 7,
+        'valid_from': datetime(2025, 8, 22), 'location_code': None,
+    }
+
+
+def test_resolve_all_depots_creates_one_depot_per_start_location(db):
+    async def resolve(session):
+        carrier = Carrier(name='Drivecool')
+        session.add(carrier)
+        await session.flush()
+        routes = [
+            {'route_name': 'Moravskoslezsko A', 'start_location': 'Depo Drivecool'},
+            {'route_name': 'Moravskoslezsko B', 'start_location': ' Depo Drivecool '},
+            {'route_name': 'Praha A', 'start_location': 'Depo Chrášťany'},
+        ]
+        depot_ids = await resolve_all_depots_for_plan(routes, carrier.id, datetime(2025, 8, 22), session)
+        await session.commit()
+        return depot_ids
+
+    depot_ids = db(resolve)
+
+    assert sorted(depot_ids) == ['Depo Chrášťany', 'Depo Drivecool']
+    assert len(set(depot_ids.values())) == 2
@@ -0,0 +1,50 @@
+"""
+Faktury - vytváření a duplicitní čísla
+"""
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app.models import Carrier
+
+
+def add_carrier(db):
+    async def create(session):
+        carrier = Carrier(name='Drivecool')
+        session.add(carrier)
+        await session.commit()
+        return carrier.id
+    return db(create)
+
+
+def invoice_payload(carrier_id, **overrides):
+    payload = {'carrier_id': carrier_id, 'invoice_number': 'FV-2025-001', 'period': '01/2025'}
+    payload.update(overrides)
+    return payload
+
+
+def test_create_invoice_rejects_duplicate_number(client, db):
+    carrier_id = add_carrier(db)
+
+    first = client.post('/api/invoices', json=invoice_payload(carrier_id))
+    assert first.status_code == 201, first.text
+
+    duplicate = client.post('/api/invoices', json=invoice_payload(carrier_id))
+    assert duplicate.status_code == 400
+    assert duplicate.json()['detail'] == 'Invoice with this number already exists'
+
+
+def test_create_invoice_with_unknown_proof_is_not_reported_as_duplicate(client, db):
+    carrier_id = add_carrier(db)
+
+    # Porušení cizího klíče proofId se nesmí vydávat za duplicitní číslo faktury
+    with pytest.raises(IntegrityError, match='FOREIGN KEY'):
+        client.post('/api/invoices', json=invoice_payload(carrier_id, proof_id=999))
+
+
+def test_get_invoices_loads_items(client, proof_with_invoice):
+    response = client.get('/api/invoices', params={'period': '01/2025'})
+
+    assert response.status_code == 200, response.text
+    [invoice] = response.json()
+    assert invoice['proofId'] == proof_with_invoice
+    assert sorted(item['itemType'] for item in invoice['items']) == ['depo', 'fix']
@@ -0,0 +1,51 @@
+"""
+Query budget middleware - rozpočet SQL dotazů na endpoint
+"""
+import logging
+
+import pytest
+from fastapi.routing import APIRoute
+
+from app import middleware
+from app.main import app
+
+
+def test_query_budgets_match_route_templates():
+    routes = {
+        (method, route.path)
+        for route in app.routes if isinstance(route, APIRoute)
+        for method in route.methods
+    }
+
+    assert set(middleware.QUERY_BUDGETS) <= routes
+
+
+def test_budget_is_keyed_by_matched_route_template(client, proof_with_invoice, caplog):
+    caplog.set_level(logging.INFO, logger=middleware.__name__)
+
+    response = client.get(f'/api/proofs/{proof_with_invoice}/daily')
+
+    assert response.status_code == 200, response.text
+    [record] = [r for r in caplog.records if r.getMessage() == 'query_count']
+    assert (record.method, record.route) == ('GET', '/api/proofs/{proof_id}/daily')
+    assert 0 < record.query_count <= middleware.QUERY_BUDGETS[('GET', record.route)]
+
+
+def test_strict_mode_fails_request_over_budget(client, proof_with_invoice, monkeypatch):
+    monkeypatch.setitem(middleware.QUERY_BUDGETS, ('GET', '/api/invoices'), 1)
+
+    # Odpověď už odešla - chyba se projeví až po ní, TestClient ji vyhodí
+    with pytest.raises(AssertionError, match=r'GET /api/invoices: 2 SQL dotazů \(rozpočet 1\)'):
+        client.get('/api/invoices')
+
+
+def test_over_budget_only_logs_outside_strict_mode(client, proof_with_invoice, monkeypatch, caplog):
+    monkeypatch.setitem(middleware.QUERY_BUDGETS, ('GET', '/api/invoices'), 1)
+    monkeypatch.setattr(middleware, 'QUERY_BUDGET_STRICT', False)
+
+    response = client.get('/api/invoices')
+
+    assert response.status_code == 200
+    assert 'GET /api/invoices: 2 SQL dotazů (rozpočet 1)' in [
+        r.getMessage() for r in caplog.records if r.levelno == logging.WARNING
+    ]
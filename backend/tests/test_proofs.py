@@ -0,0 +1,84 @@
+"""
+Proofy - upload sumáře a seznam bez načítání vztahů
+"""
+from decimal import Decimal
+from io import BytesIO
+
+import openpyxl
+from sqlalchemy import select
+
+from app.models import Carrier, ProofDepoDetail, ProofLinehaulDetail, ProofRouteDetail
+
+
+XLSX_MIME = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def make_proof_xlsx(rows):
+    wb = openpyxl.Workbook()
+    sheet = wb.active
+    sheet.title = 'Sumar'
+    for row in rows:
+        # Popisky jsou ve sloupci B, hodnoty v C-E
+        sheet.append([None, *row])
+    buffer = BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+def add_carrier(db):
+    async def create(session):
+        carrier = Carrier(name='Drivecool')
+        session.add(carrier)
+        await session.commit()
+        return carrier.id
+    return db(create)
+
+
+def stored_details(db):
+    async def load(session):
+        routes = await session.execute(select(
+            ProofRouteDetail.route_name, ProofRouteDetail.trips_count, ProofRouteDetail.total_amount,
+        ))
+        linehauls = await session.execute(select(
+            ProofLinehaulDetail.from_location, ProofLinehaulDetail.vehicle_type,
+            ProofLinehaulDetail.trips_count, ProofLinehaulDetail.rate, ProofLinehaulDetail.total_amount,
+        ))
+        depos = await session.execute(select(
+            ProofDepoDetail.depo_name, ProofDepoDetail.service_type, ProofDepoDetail.quantity,
+            ProofDepoDetail.rate, ProofDepoDetail.total_amount,
+        ))
+        return routes.all(), linehauls.all(), depos.all()
+    return db(load)
+
+
+def test_upload_proof_stores_detail_amounts(client, db):
+    carrier_id = add_carrier(db)
+    content = make_proof_xlsx([
+        ['Cena FIX', 10000],
+        ['DR', 20, 500, 10000],
+        ['Kamion', 4, 3000, 12000],
+        ['Vratimov', 22, 100, 2200],
+        ['Celková částka', 24200],
+    ])
+
+    response = client.post(
+        '/api/proofs/upload',
+        data={'carrier_id': str(carrier_id), 'period': '01/2025'},
+        files={'file': ('Drivecool 01-2025.xlsx', content, XLSX_MIME)},
+    )
+
+    assert response.status_code == 201, response.text
+    assert stored_details(db) == (
+        [('DR', 20, Decimal('10000.00'))],
+        [('Kamion', 'Kamion', 4, Decimal('3000.00'), Decimal('12000.00'))],
+        [('Vratimov', 'daily', Decimal('22.00'), Decimal('100.00'), Decimal('2200.00'))],
+    )
+
+
+def test_get_proofs_serializes_without_relationships(client, proof_with_invoice):
+    response = client.get('/api/proofs', params={'carrier_id': 1})
+
+    assert response.status_code == 200, response.text
+    [proof] = response.json()
+    assert proof['id'] == proof_with_invoice
+    assert (proof['period'], proof['depotId'], proof['grandTotal']) == ('01/2025', 1, '12000.00')
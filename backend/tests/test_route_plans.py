@@ -0,0 +1,102 @@
+"""
+Route plans - upload plánovacích souborů
+"""
+from datetime import time, timedelta
+from io import BytesIO
+from types import SimpleNamespace
+
+import openpyxl
+import pytest
+from sqlalchemy import select
+
+from app.models import Carrier, RoutePlanRoute
+from app.routers.route_plans import parse_duration
+from app.schemas import RoutePlanRouteResponse
+
+
+ROUTES_HEADER = [
+    'Identifikátor vozidla', 'Dopravce', 'Náklad 1', 'Startovní místo', 'Max Náklad 2',
+    'Začátek', 'Konec', 'Celková vzdálenost', 'Čas práce', 'DR/LH',
+]
+
+XLSX_MIME = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def make_plan_xlsx(rows):
+    wb = openpyxl.Workbook()
+    sheet = wb.active
+    sheet.title = 'Routes'
+    sheet.append(ROUTES_HEADER)
+    for row in rows:
+        sheet.append(row)
+    buffer = BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+def add_carrier(db):
+    async def create(session):
+        carrier = Carrier(name='Drivecool')
+        session.add(carrier)
+        await session.commit()
+        return carrier.id
+    return db(create)
+
+
+def stored_routes(db):
+    async def load(session):
+        result = await session.execute(
+            select(RoutePlanRoute.route_name, RoutePlanRoute.dr_lh, RoutePlanRoute.work_time)
+            .order_by(RoutePlanRoute.route_name)
+        )
+        return result.all()
+    return db(load)
+
+
+def test_upload_batch_stores_dr_lh(client, db):
+    carrier_id = add_carrier(db)
+    content = make_plan_xlsx([
+        ['Moravskoslezsko A', 'Drivecool', 20, 'Depo Drivecool', 100, '07:00', '15:30', 120.5, '08:30', 'DR-DR'],
+        ['Moravskoslezsko B', 'Drivecool', 15, 'Depo Drivecool', 100, '13:00', '18:00', 80, '00:00', 'LH-LH'],
+    ])
+
+    response = client.post(
+        '/api/route-plans/upload-batch',
+        data={'carrier_id': str(carrier_id)},
+        files=[('files', ('Drivecool 25-08-22.xlsx', content, XLSX_MIME))],
+    )
+
+    assert response.status_code == 200, response.text
+    assert response.json()['errors'] == []
+    assert stored_routes(db) == [
+        ('Moravskoslezsko A', 'DR-DR', timedelta(hours=8, minutes=30)),
+        ('Moravskoslezsko B', 'LH-LH', timedelta(0)),
+    ]
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('08:30', timedelta(hours=8, minutes=30)),
+    ('0:00', timedelta(0)),
+    ('00:00', timedelta(0)),
+    ('26:15:00', timedelta(hours=26, minutes=15)),
+    ('', None),
+    (None, None),
+    ('8', None),
+    ('abc', None),
+    ('xx:yy', None),
+])
+def test_parse_duration(value, expected):
+    assert parse_duration(value) == expected
+
+
+def test_route_response_keeps_hh_mm_times():
+    route = SimpleNamespace(
+        id=1, route_name='Moravskoslezsko A', carrier_name=None, stops_count=20,
+        start_location=None, max_capacity=None, start_time=time(7, 5), end_time=None,
+        total_distance_km=None, work_time=timedelta(hours=26, minutes=15),
+        dr_lh='DR', depot='VRATIMOV', plan_type='DPO',
+    )
+
+    data = RoutePlanRouteResponse.model_validate(route).model_dump(by_alias=True)
+
+    assert (data['startTime'], data['endTime'], data['workTime']) == ('07:05', None, '26:15')